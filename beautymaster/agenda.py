@@ -0,0 +1,88 @@
+from datetime import date, datetime, time as time_type, timedelta
+
+from .availability import DEFAULT_DURATION, format_minutes, to_minutes
+
+# Время ежедневной сводки администратору
+AGENDA_TIME = time_type(8, 0)
+# Записей на одной странице сводки
+AGENDA_PAGE_SIZE = 15
+# Запас до лимита длины сообщения Telegram (4096)
+AGENDA_PAGE_CHARS = 3500
+
+# Периоды сводки: название -> число дней начиная с сегодняшнего
+AGENDA_PERIODS = {
+    'today': 1,
+    'week': 7,
+}
+
+WEEKDAYS = "Пн Вт Ср Чт Пт Сб Вс".split()
+
+
+def agenda_range(period, today=None):
+    """Даты (с, по) периода сводки"""
+    today = today or date.today()
+    return today, today + timedelta(days=AGENDA_PERIODS[period] - 1)
+
+
+def _booking_line(b):
+    start = to_minutes(b['time'])
+    end = format_minutes(start + (b.get('duration') or DEFAULT_DURATION))
+    line = f"🕐 {b['time']}–{end} · {b['service_name']}\n"
+    line += f"   👤 {b['client_name']}"
+    if b.get('client_phone'):
+        line += f" · 📞 {b['client_phone']}"
+    return line + "\n"
+
+
+def _day_header(day_str, count):
+    day = date.fromisoformat(day_str)
+    return f"\n📅 {WEEKDAYS[day.weekday()]} {day.strftime('%d.%m.%Y')} — записей: {count}\n"
+
+
+def render_agenda(bookings, date_from, date_to, page_size=AGENDA_PAGE_SIZE):
+    """Тексты страниц сводки.
+
+    bookings — результат get_agenda, отсортированный по дате и времени.
+    Страница содержит не больше page_size записей и AGENDA_PAGE_CHARS символов;
+    заголовок дня повторяется на странице, где продолжается этот день.
+    """
+    period = date_from.strftime('%d.%m')
+    if date_to != date_from:
+        period += f"–{date_to.strftime('%d.%m')}"
+    title = f"🗓 Расписание {period}\nВсего записей: {len(bookings)}, выручка: {sum(b.get('price') or 0 for b in bookings):g}₽\n"
+
+    if not bookings:
+        return [title + "\n📭 Записей нет"]
+
+    per_day = {}
+    for b in bookings:
+        per_day[b['date']] = per_day.get(b['date'], 0) + 1
+
+    pages = []
+    current = title
+    count = 0
+    current_day = None
+    for b in bookings:
+        line = _booking_line(b)
+        if count >= page_size or len(current) + len(line) > AGENDA_PAGE_CHARS:
+            pages.append(current)
+            current = title
+            count = 0
+            current_day = None
+        if b['date'] != current_day:
+            current += _day_header(b['date'], per_day[b['date']])
+            current_day = b['date']
+        current += line
+        count += 1
+    pages.append(current)
+
+    if len(pages) > 1:
+        pages = [f"{text}\nСтраница {i + 1} из {len(pages)}" for i, text in enumerate(pages)]
+    return pages
+
+
+def next_run(at=AGENDA_TIME, now=None):
+    """Ближайший момент времени at (сегодня или завтра)"""
+    now = now or datetime.now()
+    run = datetime.combine(now.date(), at)
+    return run if run > now else run + timedelta(days=1)
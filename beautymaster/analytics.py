@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+
+from .availability import day_schedule, to_minutes
+
+# Шаг ряда аналитики
+GRANULARITIES = ('day', 'week', 'month')
+# Максимальная длина диапазона аналитики, дней
+MAX_ANALYTICS_DAYS = 3 * 366
+
+_FIELDS = ('bookings', 'cancelled', 'revenue', 'booked_minutes', 'working_minutes')
+
+
+def period_start(day, granularity):
+    """Первый день периода (неделя начинается с понедельника)"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def working_minutes_by_weekday(schedule):
+    """Рабочие минуты для каждого дня недели (0 — понедельник)"""
+    # Любая неделя: понедельник 2024-01-01 и следующие шесть дней
+    monday = date(2024, 1, 1)
+    result = {}
+    for weekday in range(7):
+        entry = day_schedule(schedule, monday + timedelta(days=weekday))
+        result[weekday] = max(0, to_minutes(entry['end_time']) - to_minutes(entry['start_time'])) if entry else 0
+    return result
+
+
+def _finish(bucket):
+    bookings = bucket['bookings']
+    working = bucket['working_minutes']
+    bucket['revenue'] = round(bucket['revenue'], 2)
+    bucket['cancellation_rate'] = round(bucket['cancelled'] / bookings, 3) if bookings else 0
+    # Для периодов без рабочего времени занятость не определена
+    bucket['utilization'] = round(bucket['booked_minutes'] / working, 3) if working else None
+    return bucket
+
+
+def build_series(rows, schedule, date_from, date_to, granularity='day'):
+    """Ряд по периодам и итог за весь диапазон.
+
+    rows — результат get_daily_stats; дни без записей входят в ряд нулями,
+    чтобы график был непрерывным. Крайние периоды обрезаются по диапазону.
+    """
+    by_day = {row['date']: row for row in rows}
+    minutes = working_minutes_by_weekday(schedule)
+
+    buckets = {}
+    day = date_from
+    while day <= date_to:
+        start = period_start(day, granularity)
+        bucket = buckets.get(start)
+        if bucket is None:
+            bucket = buckets[start] = dict.fromkeys(_FIELDS, 0)
+            bucket['period'] = start.isoformat()
+            bucket['date_from'] = day.isoformat()
+        bucket['date_to'] = day.isoformat()
+
+        row = by_day.get(day.isoformat())
+        if row:
+            for field in ('bookings', 'cancelled', 'revenue', 'booked_minutes'):
+                bucket[field] += row[field] or 0
+        bucket['working_minutes'] += minutes[day.weekday()]
+        day += timedelta(days=1)
+
+    series = list(buckets.values())
+    totals = {field: sum(b[field] for b in series) for field in _FIELDS}
+    totals.update(date_from=date_from.isoformat(), date_to=date_to.isoformat())
+    return [_finish(b) for b in series], _finish(totals)
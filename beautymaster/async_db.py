@@ -0,0 +1,66 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Ограничение числа потоков, выполняющих запросы ботов к SQLite
+DEFAULT_MAX_WORKERS = 8
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_max_workers = DEFAULT_MAX_WORKERS
+
+
+def configure(max_workers: int):
+    """Задать размер общего пула потоков (до первого использования)"""
+    global _max_workers
+    _max_workers = max(1, max_workers)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Общий ограниченный пул потоков для запросов ботов"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_max_workers, thread_name_prefix='bot-db')
+        return _executor
+
+
+def shutdown():
+    """Остановить пул потоков"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+class AsyncDatabaseManager:
+    """Асинхронная обертка над DatabaseManager с тем же API.
+
+    Каждый вызов метода выполняется в общем пуле потоков, поэтому медленный
+    запрос или ожидание блокировки записи не останавливает event loop бота.
+    """
+
+    def __init__(self, db, executor: ThreadPoolExecutor | None = None):
+        self.db = db
+        self._executor = executor
+
+    async def run(self, func, *args, **kwargs):
+        """Выполнить func(db, *args, **kwargs) в пуле потоков"""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, self.db, *args, **kwargs)
+        return await loop.run_in_executor(self._executor or get_executor(), call)
+
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def method(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            call = functools.partial(attr, *args, **kwargs)
+            return await loop.run_in_executor(self._executor or get_executor(), call)
+
+        return method
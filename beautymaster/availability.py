@@ -0,0 +1,157 @@
+from bisect import bisect_right
+from datetime import date as date_type, timedelta
+
+# Шаг сетки слотов и длительность по умолчанию, минуты
+SLOT_STEP = 30
+DEFAULT_DURATION = 60
+
+
+def to_minutes(value):
+    """'HH:MM' -> минуты от полуночи"""
+    hours, minutes = value.split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def format_minutes(value):
+    """Минуты от полуночи -> 'HH:MM'"""
+    return f'{value // 60:02d}:{value % 60:02d}'
+
+
+class BusyIntervals:
+    """Занятые интервалы дня: отсортированные и слитые [начало, конец) в минутах"""
+
+    def __init__(self, intervals=()):
+        merged = []
+        for start, end in sorted(intervals):
+            if end <= start:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.starts = [s for s, _ in merged]
+        self.ends = [e for _, e in merged]
+
+    @classmethod
+    def from_bookings(cls, bookings, default_duration=DEFAULT_DURATION):
+        """Интервалы из строк бронирований с полями time и duration"""
+        intervals = []
+        for b in bookings:
+            start = to_minutes(b['time'])
+            intervals.append((start, start + (b.get('duration') or default_duration)))
+        return cls(intervals)
+
+    def overlaps(self, start, end):
+        """Пересекается ли [start, end) с каким-либо занятым интервалом"""
+        i = bisect_right(self.starts, start) - 1
+        if i >= 0 and self.ends[i] > start:
+            return True
+        return i + 1 < len(self.starts) and self.starts[i + 1] < end
+
+    def free_slots(self, work_start, work_end, duration, step=SLOT_STEP, not_before=None):
+        """Начала свободных слотов: услуга длительностью duration целиком
+        помещается в рабочее время и не пересекается с занятыми интервалами.
+
+        Один проход по слотам и интервалам, O(слоты + интервалы).
+        """
+        slots = []
+        i = 0
+        count = len(self.starts)
+        start = work_start
+        while start + duration <= work_end:
+            if not_before is None or start >= not_before:
+                # Пропускаем интервалы, закончившиеся до начала слота
+                while i < count and self.ends[i] <= start:
+                    i += 1
+                if i >= count or self.starts[i] >= start + duration:
+                    slots.append(start)
+            start += step
+        return slots
+
+
+def day_schedule(schedule, day):
+    """Рабочий день из расписания (или None, если день нерабочий)"""
+    entry = next((s for s in schedule if s['day_of_week'] == day.weekday()), None)
+    if not entry or not entry.get('is_working') or not entry.get('start_time') or not entry.get('end_time'):
+        return None
+    return entry
+
+
+def service_duration(db, service_id, default=None):
+    """Длительность услуги в минутах"""
+    if service_id:
+        service = db.get_service(service_id)
+        if service and service.get('duration'):
+            return service['duration']
+    return default or DEFAULT_DURATION
+
+
+def compute_slots(entry, bookings, duration, step=SLOT_STEP, not_before=None):
+    """Свободные слоты ('HH:MM') рабочего дня entry с учетом бронирований"""
+    busy = BusyIntervals.from_bookings(bookings)
+    slots = busy.free_slots(
+        to_minutes(entry['start_time']),
+        to_minutes(entry['end_time']),
+        duration,
+        step,
+        not_before
+    )
+    return [format_minutes(m) for m in slots]
+
+
+def _not_before(day, now):
+    """Для сегодняшнего дня прошедшее время недоступно"""
+    if now is None or day != now.date():
+        return None
+    return now.hour * 60 + now.minute
+
+
+def day_availability(db, day, duration=None, step=SLOT_STEP, now=None):
+    """Доступность на день.
+
+    Возвращает (расписание дня или None, бронирования дня, свободные слоты).
+    now задает текущий момент, если прошедшие слоты нужно скрыть.
+    """
+    if isinstance(day, str):
+        day = date_type.fromisoformat(day)
+
+    entry = day_schedule(db.get_schedule(), day)
+    if not entry:
+        return None, [], []
+
+    bookings = db.get_busy_bookings(day.isoformat())
+    slots = compute_slots(entry, bookings, duration or step, step, _not_before(day, now))
+    return entry, bookings, slots
+
+
+def range_availability(db, date_from, date_to, duration=None, step=SLOT_STEP, now=None):
+    """Доступность на диапазон дат: расписание и бронирования читаются одним запросом каждое.
+
+    Возвращает список {'date', 'is_working', 'available_slots', 'fully_booked'} по дням.
+    """
+    if isinstance(date_from, str):
+        date_from = date_type.fromisoformat(date_from)
+    if isinstance(date_to, str):
+        date_to = date_type.fromisoformat(date_to)
+
+    schedule = db.get_schedule()
+    by_date = {}
+    for b in db.get_busy_bookings(date_from.isoformat(), date_to.isoformat()):
+        by_date.setdefault(b['date'], []).append(b)
+
+    days = []
+    day = date_from
+    while day <= date_to:
+        entry = day_schedule(schedule, day)
+        slots = []
+        if entry:
+            slots = compute_slots(entry, by_date.get(day.isoformat(), []),
+                                  duration or step, step, _not_before(day, now))
+        days.append({
+            'date': day.isoformat(),
+            'is_working': bool(entry),
+            'available_slots': slots,
+            'fully_booked': bool(entry) and not slots,
+        })
+        day += timedelta(days=1)
+    return days
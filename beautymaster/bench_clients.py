@@ -0,0 +1,86 @@
+import sys
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Добавляем путь к корневой папке проекта
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+from plugins.beautymaster.models import DatabaseManager
+
+
+def get_clients_n_plus_one(db):
+    """Прежняя реализация get_clients: два запроса на каждого клиента"""
+    result = []
+    with db.connection() as conn:
+        clients = conn.execute('SELECT * FROM clients ORDER BY name').fetchall()
+    for c in clients:
+        client = dict(c)
+        conn = db.get_connection()
+        client['total_visits'] = conn.execute(
+            'SELECT COUNT(*) FROM bookings WHERE client_id = ?', (client['id'],)).fetchone()[0]
+        client['last_visit'] = conn.execute(
+            'SELECT MAX(date) FROM bookings WHERE client_id = ?', (client['id'],)).fetchone()[0]
+        conn.close()
+        result.append(client)
+    return result
+
+
+def fill_database(db, clients_count, bookings_per_client=10):
+    """Заполнение базы тестовыми клиентами и бронированиями"""
+    with db.connection() as conn:
+        conn.execute("INSERT INTO services (name, price, duration) VALUES ('Стрижка', 1500, 60)")
+        start = date.today() - timedelta(days=365)
+        for i in range(clients_count):
+            cursor = conn.execute(
+                'INSERT INTO clients (name, phone) VALUES (?, ?)',
+                (f'Клиент {i:05d}', f'+7999{i:07d}')
+            )
+            client_id = cursor.lastrowid
+            conn.executemany(
+                'INSERT INTO bookings (client_id, service_id, date, time, duration) VALUES (?, 1, ?, ?, 60)',
+                [
+                    (client_id,
+                     (start + timedelta(days=random.randrange(365))).isoformat(),
+                     f'{random.randrange(9, 18):02d}:00')
+                    for _ in range(bookings_per_client)
+                ]
+            )
+        conn.commit()
+
+
+def measure(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def run_benchmark(sizes=(100, 1000, 3000)):
+    print("=" * 60)
+    print("⏱ БЕНЧМАРК get_clients")
+    print("=" * 60)
+    print(f"{'Клиентов':>10} {'N+1, мс':>12} {'JOIN, мс':>12} {'Ускорение':>10}")
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = DatabaseManager(f'bench_{size}', db_path=os.path.join(tmp, 'bench.db'))
+            fill_database(db, size)
+
+            assert get_clients_n_plus_one(db) == db.get_clients()
+
+            old_ms = measure(lambda: get_clients_n_plus_one(db), repeat=1)
+            new_ms = measure(db.get_clients)
+            print(f"{size:>10} {old_ms:>12.1f} {new_ms:>12.1f} {old_ms / new_ms:>9.1f}x")
+            db.close()
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -1,8 +1,10 @@
 import asyncio
+import hashlib
 import threading
 import logging
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta, date, time as time_type
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.helpers import escape_markdown
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -15,6 +17,16 @@ import sys
 import traceback
 import re
 
+from .availability import day_availability, range_availability, service_duration, DEFAULT_DURATION
+from . import async_db
+from .async_db import AsyncDatabaseManager
+from .ratelimit import TokenBucket
+from .outbox import Outbox
+from .persistence import SQLitePersistence
+from .render_cache import RenderCache
+from .agenda import AGENDA_TIME, agenda_range, next_run, render_agenda
+from .reminders import ReminderScheduler, new_counters, REMINDER_INTERVAL, REMINDER_LEAD_HOURS
+
 # Настройка логирования
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -22,36 +34,170 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Размер пула HTTP-соединений одного бота (по умолчанию в PTB — 256)
+BOT_CONNECTION_POOL_SIZE = 8
+
+# Ограничение рассылок одного бота, сообщений в секунду (лимит Telegram — около 30)
+BOT_MESSAGE_RATE = 25
+
+# Путь приема обновлений в режиме webhook (общий для всех ботов)
+WEBHOOK_ROUTE = '/api/plugins/beautymaster/telegram'
+
+
+# Неизменяемые клавиатуры меню строятся один раз
+MAIN_MENU_BUTTONS = [
+    [InlineKeyboardButton("📅 Записаться", callback_data="book")],
+    [InlineKeyboardButton("📋 Мои записи", callback_data="my_bookings")],
+    [InlineKeyboardButton("ℹ️ Услуги", callback_data="services")],
+    [InlineKeyboardButton("📞 Контакты", callback_data="contacts")],
+    [InlineKeyboardButton("📨 Связаться с админом", callback_data="contact_admin")],
+]
+MAIN_MENU = InlineKeyboardMarkup(MAIN_MENU_BUTTONS)
+MAIN_MENU_ADMIN = InlineKeyboardMarkup(
+    MAIN_MENU_BUTTONS + [[InlineKeyboardButton("⚙️ Админ панель", callback_data="admin")]]
+)
+ADMIN_PANEL = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📅 Расписание на сегодня", callback_data="admin_today")],
+    [InlineKeyboardButton("🗓 Расписание на неделю", callback_data="admin_week")],
+    [InlineKeyboardButton("📊 Статистика", callback_data="admin_stats")],
+    [InlineKeyboardButton("👥 Клиенты", callback_data="admin_clients")],
+    [InlineKeyboardButton("⚙️ Настройки", callback_data="admin_settings")],
+    [InlineKeyboardButton("◀️ Назад", callback_data="main_menu")],
+])
+BACK_TO_MENU = InlineKeyboardMarkup([[InlineKeyboardButton("◀️ Назад", callback_data="main_menu")]])
+
+# Дней в выборе даты
+DATE_PICKER_DAYS = 14
+# Сколько предстоящих записей показывать в «Мои записи»
+MY_BOOKINGS_LIMIT = 10
+
+
+def webhook_path(token: str) -> str:
+    """Сегмент URL webhook бота: не раскрывает токен, но однозначно его определяет"""
+    return hashlib.sha256(f"path:{token}".encode()).hexdigest()[:32]
+
+
+def webhook_secret(token: str) -> str:
+    """Значение X-Telegram-Bot-Api-Secret-Token для бота"""
+    return hashlib.sha256(f"secret:{token}".encode()).hexdigest()
+
+
+def md(value) -> str:
+    """Текст пользователя для сообщения с parse_mode='Markdown'"""
+    return escape_markdown(str(value), version=1)
+
+
+class BotLoop:
+    """Поток с event loop, в котором работают боты нескольких мастеров"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.bots: set[str] = set()
+
+    def start(self):
+        self.thread.start()
+        logger.info(f"✅ Поток {self.name} запущен")
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def submit(self, coro):
+        """Запланировать корутину в этом loop из другого потока"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self, timeout: float = 5.0):
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=timeout)
+
 
 class BotInstance:
     """Отдельный экземпляр бота для одного мастера"""
 
-    def __init__(self, master_id: str, token: str, admin_id: str | None, plugin):
+    def __init__(self, master_id: str, token: str, admin_id: str | None, plugin,
+                 webhook_url: str | None = None, api_base_url: str | None = None,
+                 agenda_time: time_type | None = None):
         self.master_id = master_id
         self.token = token.strip()
         self.admin_id = admin_id
         self.plugin = plugin
+        # Базовый публичный URL сервера; если задан, бот работает через webhook
+        self.webhook_url = webhook_url.rstrip('/') if webhook_url else None
+        self.api_base_url = api_base_url
+        self.webhook_path = webhook_path(self.token)
+        self.webhook_secret = webhook_secret(self.token)
         self.application: Application | None = None
+        self.bot_loop: BotLoop | None = None
         self.loop = None
         self.running = False
-        self.thread: threading.Thread | None = None
+        # created -> starting -> running | failed -> stopping -> stopped
+        self.state = 'created'
+        self._start_task: asyncio.Task | None = None
+        self.stop_future = None
+        self.rate_limiter = TokenBucket(BOT_MESSAGE_RATE)
+        self.outbox: Outbox | None = None
+        # Готовые тексты и клавиатуры; устаревают при записи данных мастера
+        self.cache = RenderCache()
+        # Время ежедневной сводки администратору (None — не отправлять)
+        self.agenda_time = agenda_time
+        self._agenda_task: asyncio.Task | None = None
         logger.info(f"🤖 Создан экземпляр бота для мастера {master_id}")
 
-    def start(self):
-        """Запуск бота в отдельном потоке"""
+    def start(self, bot_loop: "BotLoop", after=None):
+        """Запуск бота в общем event loop. Возвращает concurrent.futures.Future.
+
+        after — future остановки предыдущего бота мастера: запуск начнется
+        после ее завершения, не блокируя вызывающий поток.
+        """
         if self.running:
             logger.warning(f"Бот {self.master_id} уже запущен")
-            return
-
-        self.thread = threading.Thread(target=self._run_bot, daemon=True)
-        self.thread.start()
-        logger.info(f"✅ Поток бота для мастера {self.master_id} запущен")
-
-    def _run_bot(self):
-        """Запуск бота в собственном event loop"""
-        self.loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(self.loop)
-
+            return None
+
+        self.bot_loop = bot_loop
+        self.loop = bot_loop.loop
+        self.state = 'starting'
+        return bot_loop.submit(self._async_start(after))
+
+    def _build_application(self) -> Application:
+        builder = (
+            Application.builder()
+            .token(self.token)
+            .connection_pool_size(BOT_CONNECTION_POOL_SIZE)
+            # Незаконченные диалоги переживают перезапуск бота
+            .persistence(SQLitePersistence(self._db))
+        )
+        if self.api_base_url:
+            builder = (
+                builder
+                .base_url(f"{self.api_base_url}/bot")
+                .base_file_url(f"{self.api_base_url}/file/bot")
+            )
+        if self.webhook_url:
+            # Обновления приходят через общий HTTP endpoint, Updater не нужен
+            builder = builder.updater(None)
+        application = builder.build()
+
+        # Регистрация обработчиков
+        application.add_handler(CommandHandler("start", self.start_command))
+        application.add_handler(CallbackQueryHandler(self.button_handler))
+        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+        application.add_error_handler(self.error_handler)
+        return application
+
+    async def _async_start(self, after=None):
+        """Инициализация и запуск приема обновлений (выполняется в event loop)"""
+        self._start_task = asyncio.current_task()
+        if after is not None:
+            await asyncio.gather(asyncio.wrap_future(after), return_exceptions=True)
+        if self.state != 'starting':
+            # Бот остановили раньше, чем он успел запуститься
+            return False
         try:
             print(f"\n🚀 [МАСТЕР {self.master_id}] ЗАПУСК БОТА")
             print(f"   Токен: {self.token[:10]}...{self.token[-5:]}")
@@ -60,73 +206,112 @@ class BotInstance:
 
             if not self.token:
                 print(f"❌ [МАСТЕР {self.master_id}] Токен отсутствует!")
-                return
-
-            self.application = Application.builder().token(self.token).build()
+                return False
 
-            # Регистрация обработчиков
-            self.application.add_handler(CommandHandler("start", self.start_command))
-            self.application.add_handler(CallbackQueryHandler(self.button_handler))
-            self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
-            self.application.add_error_handler(self.error_handler)
+            self.application = self._build_application()
 
             print(f"✅ [МАСТЕР {self.master_id}] Бот инициализирован")
             sys.stdout.flush()
 
-            self.running = True
+            await self.application.initialize()
+            await self.application.start()
+
+            self.outbox = Outbox(self, self.rate_limiter)
+            await self.outbox.restore()
+            if self.agenda_time:
+                self._agenda_task = asyncio.create_task(self._agenda_job())
 
-            # Запуск polling с drop_pending_updates
-            self.loop.run_until_complete(self.application.initialize())
-            self.loop.run_until_complete(self.application.start())
-            self.loop.run_until_complete(
-                self.application.updater.start_polling(
+            if self.webhook_url:
+                await self.application.bot.set_webhook(
+                    url=f"{self.webhook_url}{WEBHOOK_ROUTE}/{self.webhook_path}",
+                    secret_token=self.webhook_secret,
+                    allowed_updates=Update.ALL_TYPES,
+                    drop_pending_updates=True,
+                )
+            else:
+                # Запуск polling с drop_pending_updates
+                await self.application.updater.start_polling(
                     allowed_updates=Update.ALL_TYPES,
                     drop_pending_updates=True,
                     poll_interval=0.5,
                     timeout=10,
                 )
-            )
 
-            self.loop.run_forever()
+            self.running = True
+            self.state = 'running'
+            return True
 
         except Exception as e:
             logger.exception(f"Критическая ошибка в боте {self.master_id}")
             print(f"❌ [МАСТЕР {self.master_id}] Ошибка: {e}")
             traceback.print_exc()
             sys.stdout.flush()
-        finally:
-            self.running = False
-            if self.application:
-                try:
-                    self.loop.run_until_complete(self.application.updater.stop())
-                    self.loop.run_until_complete(self.application.stop())
-                    self.loop.run_until_complete(self.application.shutdown())
-                except Exception as e:
-                    logger.error(f"Ошибка graceful shutdown: {e}")
-            self.loop.close()
-            print(f"⏹ [МАСТЕР {self.master_id}] Бот остановлен")
-            sys.stdout.flush()
-
-    def stop(self):
-        """Остановка бота (вызывается из главного потока)"""
-        if not self.running:
+            await self._shutdown()
+            self.state = 'failed'
+            return False
+
+    def stop_async(self):
+        """Запланировать остановку бота. Возвращает concurrent.futures.Future или None"""
+        if not self.bot_loop or self.state in ('stopping', 'stopped'):
+            return None
+        self.state = 'stopping'
+        self.stop_future = self.bot_loop.submit(self._async_stop())
+        return self.stop_future
+
+    def stop(self, timeout: float = 8.0):
+        """Остановка бота с ожиданием (вызывается из любого потока, кроме потока event loop)"""
+        future = self.stop_async()
+        if not future:
             return
 
-        if self.application and self.application.updater and self.loop:
-            try:
-                future = asyncio.run_coroutine_threadsafe(self._async_stop(), self.loop)
-                future.result(timeout=8.0)
-            except Exception as e:
-                logger.error(f"Ошибка остановки бота {self.master_id}: {e}")
+        try:
+            future.result(timeout=timeout)
+        except Exception as e:
+            logger.error(f"Ошибка остановки бота {self.master_id}: {e}")
 
-        self.running = False
         logger.info(f"⏹ Бот для мастера {self.master_id} остановлен")
 
+    def feed_update(self, data: dict) -> bool:
+        """Передать обновление из webhook в очередь Application (из любого потока)"""
+        application = self.application
+        if not self.running or not application or not self.loop:
+            return False
+
+        update = Update.de_json(data, application.bot)
+        self.loop.call_soon_threadsafe(application.update_queue.put_nowait, update)
+        return True
+
     async def _async_stop(self):
-        if self.application:
-            await self.application.updater.stop()
-            await self.application.stop()
-            await self.application.shutdown()
+        self.state = 'stopping'
+        start_task = self._start_task
+        if start_task and start_task is not asyncio.current_task() and not start_task.done():
+            # Дожидаемся запуска, чтобы не оставить работающий Application
+            await asyncio.gather(start_task, return_exceptions=True)
+        await self._shutdown()
+        self.state = 'stopped'
+
+    async def _shutdown(self):
+        self.running = False
+        agenda_task, self._agenda_task = self._agenda_task, None
+        if agenda_task:
+            agenda_task.cancel()
+            await asyncio.gather(agenda_task, return_exceptions=True)
+        outbox, self.outbox = self.outbox, None
+        if outbox:
+            await outbox.close()
+        application, self.application = self.application, None
+        if not application:
+            return
+        try:
+            if application.updater and application.updater.running:
+                await application.updater.stop()
+            if application.running:
+                await application.stop()
+            await application.shutdown()
+        except Exception as e:
+            logger.error(f"Ошибка graceful shutdown: {e}")
+        print(f"⏹ [МАСТЕР {self.master_id}] Бот остановлен")
+        sys.stdout.flush()
 
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка команды /start"""
@@ -134,10 +319,9 @@ class BotInstance:
             user = update.effective_user
             logger.info(f"🤖 [МАСТЕР {self.master_id}] КОМАНДА /start от {user.id} ({user.first_name})")
 
-            from .models import DatabaseManager
-            db = DatabaseManager(self.master_id)
+            db = self._db()
 
-            client = db.get_client_by_telegram(str(user.id))
+            client = await db.get_client_by_telegram(str(user.id))
 
             if client:
                 welcome_text = f"👋 С возвращением, {client['name']}!\n\n"
@@ -145,20 +329,9 @@ class BotInstance:
             else:
                 welcome_text = "👋 Добро пожаловать! Я помогу вам записаться на услуги.\n\n"
 
-            keyboard = [
-                [InlineKeyboardButton("📅 Записаться", callback_data="book")],
-                [InlineKeyboardButton("📋 Мои записи", callback_data="my_bookings")],
-                [InlineKeyboardButton("ℹ️ Услуги", callback_data="services")],
-                [InlineKeyboardButton("📞 Контакты", callback_data="contacts")],
-                [InlineKeyboardButton("📨 Связаться с админом", callback_data="contact_admin")],
-            ]
-
-            if self.admin_id and str(user.id) == str(self.admin_id):
-                keyboard.append([InlineKeyboardButton("⚙️ Админ панель", callback_data="admin")])
-
             await update.message.reply_text(
                 welcome_text + "Выберите действие:",
-                reply_markup=InlineKeyboardMarkup(keyboard)
+                reply_markup=self._main_menu(user.id)
             )
         except Exception as e:
             logger.error(f"Ошибка в start_command: {e}")
@@ -183,6 +356,11 @@ class BotInstance:
                 await self.show_contacts(query, context)
             elif data == "admin":
                 await self.show_admin_panel(query, context)
+            elif data in ("admin_today", "admin_week"):
+                await self.show_agenda(query, context, data.split("_")[1])
+            elif data.startswith("agenda_"):
+                _, period, page = data.split("_")
+                await self.show_agenda(query, context, period, int(page))
             elif data == "main_menu":
                 await self.show_main_menu(query, context)
             elif data == "contact_admin":
@@ -214,6 +392,35 @@ class BotInstance:
             logger.error(f"Ошибка в button_handler: {e}")
             await query.edit_message_text("❌ Произошла ошибка. Попробуйте позже.")
 
+    def _is_admin(self, user_id) -> bool:
+        return bool(self.admin_id) and str(user_id) == str(self.admin_id)
+
+    def _main_menu(self, user_id) -> InlineKeyboardMarkup:
+        return MAIN_MENU_ADMIN if self._is_admin(user_id) else MAIN_MENU
+
+    async def _versions(self, *scopes) -> tuple:
+        """Версии данных мастера для ключей кэша (из таблицы data_versions, одним чтением)"""
+        return await self._db().stored_version(*scopes)
+
+    async def _services(self) -> list:
+        """Активные услуги (из кэша, пока услуги не менялись)"""
+        version = await self._versions('services')
+        services = self.cache.get('services', version)
+        if services is None:
+            services = self.cache.put('services', version, await self._db().get_services(active_only=True))
+        return services
+
+    async def _service_duration(self, service_id) -> int:
+        for s in await self._services():
+            if s['id'] == service_id:
+                return s['duration'] or DEFAULT_DURATION
+        # Услуга могла стать неактивной после выбора
+        return await self._db().run(service_duration, service_id)
+
+    def _db(self) -> AsyncDatabaseManager:
+        """Асинхронный доступ к базе мастера: запросы выполняются вне event loop"""
+        return AsyncDatabaseManager(self.plugin.get_db_for_master(self.master_id))
+
     def _is_date_in_past(self, date_str: str) -> bool:
         try:
             selected_date = date.fromisoformat(date_str)
@@ -222,98 +429,126 @@ class BotInstance:
             return True
 
     async def show_services(self, query, context):
-        from .models import DatabaseManager
-        db = DatabaseManager(self.master_id)
-        services = db.get_services(active_only=True)
+        version = await self._versions('services')
+        keyboard = self.cache.get('services_keyboard', version)
+        if keyboard is None:
+            services = await self._services()
+            buttons = [
+                [InlineKeyboardButton(
+                    f"{s['name']} — {s['price']}₽ ({s['duration']} мин)",
+                    callback_data=f"service_{s['id']}"
+                )]
+                for s in services
+            ]
+            if buttons:
+                buttons.append([InlineKeyboardButton("◀️ Назад", callback_data="main_menu")])
+            keyboard = self.cache.put('services_keyboard', version, InlineKeyboardMarkup(buttons) if buttons else False)
 
-        if not services:
+        if not keyboard:
             await query.edit_message_text(
                 "😕 Услуги временно недоступны.",
                 reply_markup=self._back_button("main_menu")
             )
             return
 
-        keyboard = []
-        for s in services:
-            keyboard.append([InlineKeyboardButton(
-                f"{s['name']} — {s['price']}₽ ({s['duration']} мин)",
-                callback_data=f"service_{s['id']}"
-            )])
-
-        keyboard.append([InlineKeyboardButton("◀️ Назад", callback_data="main_menu")])
-
         await query.edit_message_text(
             "📋 Выберите услугу:",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=keyboard
         )
 
     async def show_services_list(self, query, context):
-        from .models import DatabaseManager
-        db = DatabaseManager(self.master_id)
-        services = db.get_services(active_only=True)
-
-        if not services:
+        version = await self._versions('services')
+        text = self.cache.get('services_text', version)
+        if text is None:
+            services = await self._services()
+            text = ""
+            if services:
+                text = "📋 Наши услуги:\n\n"
+                for s in services:
+                    text += f"• {s['name']} — {s['price']}₽ ({s['duration']} мин)\n{s['description']}\n\n"
+            self.cache.put('services_text', version, text)
+
+        if not text:
             await query.edit_message_text("😕 Нет активных услуг.")
             return
 
-        text = "📋 Наши услуги:\n\n"
-        for s in services:
-            text += f"• {s['name']} — {s['price']}₽ ({s['duration']} мин)\n{s['description']}\n\n"
-
-        keyboard = [[InlineKeyboardButton("◀️ Назад", callback_data="main_menu")]]
-
         await query.edit_message_text(
             text,
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=BACK_TO_MENU
         )
 
     async def show_contacts(self, query, context):
-        from .models import DatabaseManager
-        db = DatabaseManager(self.master_id)
-        profile = db.get_profile()
-
-        text = "📞 Контакты:\n\n"
-        text += f"🏢 Салон: {profile.get('salon_name', '—')}\n"
-        text += f"📱 Телефон: {profile.get('phone', '—')}\n"
-        text += f"📍 Адрес: {profile.get('address', '—')}\n"
-        text += f"\nℹ️ {profile.get('description', '')}"
-
-        keyboard = [[InlineKeyboardButton("◀️ Назад", callback_data="main_menu")]]
+        version = await self._versions('profile')
+        text = self.cache.get('contacts', version)
+        if text is None:
+            profile = await self._db().get_profile()
+
+            text = "📞 Контакты:\n\n"
+            text += f"🏢 Салон: {profile.get('salon_name', '—')}\n"
+            text += f"📱 Телефон: {profile.get('phone', '—')}\n"
+            text += f"📍 Адрес: {profile.get('address', '—')}\n"
+            text += f"\nℹ️ {profile.get('description', '')}"
+            self.cache.put('contacts', version, text)
 
         await query.edit_message_text(
             text,
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=BACK_TO_MENU
         )
 
     async def show_admin_panel(self, query, context):
-        keyboard = [
-            [InlineKeyboardButton("📅 Расписание на сегодня", callback_data="admin_today")],
-            [InlineKeyboardButton("📊 Статистика", callback_data="admin_stats")],
-            [InlineKeyboardButton("👥 Клиенты", callback_data="admin_clients")],
-            [InlineKeyboardButton("⚙️ Настройки", callback_data="admin_settings")],
-            [InlineKeyboardButton("◀️ Назад", callback_data="main_menu")],
-        ]
-
         await query.edit_message_text(
             "⚙️ Админ панель:",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=ADMIN_PANEL
         )
 
-    async def show_main_menu(self, query, context):
-        keyboard = [
-            [InlineKeyboardButton("📅 Записаться", callback_data="book")],
-            [InlineKeyboardButton("📋 Мои записи", callback_data="my_bookings")],
-            [InlineKeyboardButton("ℹ️ Услуги", callback_data="services")],
-            [InlineKeyboardButton("📞 Контакты", callback_data="contacts")],
-            [InlineKeyboardButton("📨 Связаться с админом", callback_data="contact_admin")],
-        ]
-        
-        if self.admin_id and str(query.from_user.id) == str(self.admin_id):
-            keyboard.append([InlineKeyboardButton("⚙️ Админ панель", callback_data="admin")])
+    async def _agenda_pages(self, period: str) -> list[str]:
+        """Страницы сводки за период (из кэша до следующего изменения записей)"""
+        today = date.today()
+        version = await self._versions('bookings', 'clients', 'services') + (today,)
+        pages = self.cache.get(f'agenda_{period}', version)
+        if pages is None:
+            date_from, date_to = agenda_range(period, today)
+            bookings = await self._db().get_agenda(date_from.isoformat(), date_to.isoformat())
+            pages = self.cache.put(f'agenda_{period}', version, render_agenda(bookings, date_from, date_to))
+        return pages
+
+    async def show_agenda(self, query, context, period: str, page: int = 0):
+        if not self._is_admin(query.from_user.id):
+            await query.edit_message_text("⛔ Доступно только администратору")
+            return
+
+        pages = await self._agenda_pages(period)
+        page = max(0, min(page, len(pages) - 1))
+
+        nav = []
+        if page > 0:
+            nav.append(InlineKeyboardButton("◀️", callback_data=f"agenda_{period}_{page - 1}"))
+        if page < len(pages) - 1:
+            nav.append(InlineKeyboardButton("▶️", callback_data=f"agenda_{period}_{page + 1}"))
+        keyboard = [nav] if nav else []
+        keyboard.append([InlineKeyboardButton("◀️ Админ панель", callback_data="admin")])
+
+        await query.edit_message_text(pages[page], reply_markup=InlineKeyboardMarkup(keyboard))
 
+    async def _agenda_job(self):
+        """Ежедневно в agenda_time готовит сводки и отправляет администратору расписание на сегодня"""
+        while True:
+            await asyncio.sleep((next_run(self.agenda_time) - datetime.now()).total_seconds())
+            try:
+                pages = await self._agenda_pages('today')
+                await self._agenda_pages('week')
+                if self.admin_id:
+                    text = pages[0]
+                    if len(pages) > 1:
+                        text += "\n\nПолное расписание — в админ панели (/start)"
+                    self._send_later(self.admin_id, text, parse_mode=None)
+            except Exception as e:
+                logger.error(f"Ошибка сводки для мастера {self.master_id}: {e}")
+
+    async def show_main_menu(self, query, context):
         await query.edit_message_text(
             "👋 **Главное меню:**\n\nВыберите действие:",
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=self._main_menu(query.from_user.id),
             parse_mode='Markdown'
         )
 
@@ -325,56 +560,75 @@ class BotInstance:
         )
 
     async def select_date(self, query, context):
+        duration = await self._service_duration(context.user_data.get('selected_service'))
         today = date.today()
-        keyboard = []
-
-        for i in range(14):
-            d = today + timedelta(days=i)
-            date_str = d.isoformat()
-            display = d.strftime("%d.%m.%Y")
-            weekday = "Пн Вт Ср Чт Пт Сб Вс".split()[d.weekday()]
-            keyboard.append([InlineKeyboardButton(
-                f"📅 {display} ({weekday})",
-                callback_data=f"date_{date_str}"
-            )])
-
-        keyboard.append([InlineKeyboardButton("◀️ Назад", callback_data="book")])
+        version = await self._versions('schedule', 'bookings') + (today,)
+        markup = self.cache.get(f'dates_{duration}', version)
+
+        if markup is None:
+            # Доступность на 14 дней одним запросом: нерабочие и занятые дни не показываем
+            now = datetime.now()
+            days = await self._db().run(range_availability, today, today + timedelta(days=DATE_PICKER_DAYS - 1),
+                                        duration, now=now)
+
+            keyboard = []
+            expires = None
+            for day in days:
+                if not day['available_slots']:
+                    continue
+                d = date.fromisoformat(day['date'])
+                if d == today:
+                    # Сегодняшний день пропадет из списка, когда пройдет его последний свободный слот
+                    last = datetime.combine(today, datetime.strptime(day['available_slots'][-1], '%H:%M').time())
+                    expires = last + timedelta(minutes=1)
+                display = d.strftime("%d.%m.%Y")
+                weekday = "Пн Вт Ср Чт Пт Сб Вс".split()[d.weekday()]
+                keyboard.append([InlineKeyboardButton(
+                    f"📅 {display} ({weekday})",
+                    callback_data=f"date_{day['date']}"
+                )])
+            keyboard.append([InlineKeyboardButton("◀️ Назад", callback_data="book")])
+            markup = InlineKeyboardMarkup(keyboard) if len(keyboard) > 1 else False
+            self.cache.put(f'dates_{duration}', version, markup, expires)
+
+        if not markup:
+            await query.edit_message_text(
+                "😕 В ближайшие две недели нет свободного времени",
+                reply_markup=self._back_button("book")
+            )
+            return
 
         await query.edit_message_text(
             "📅 Выберите дату:",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=markup
         )
 
     async def select_time(self, query, context):
-        from .models import DatabaseManager
-        db = DatabaseManager(self.master_id)
+        db = self._db()
 
         selected_date = context.user_data.get('selected_date')
         if not selected_date:
             await query.edit_message_text("❌ Дата не выбрана")
             return
 
-        # Получаем расписание для дня недели
-        day_of_week = datetime.fromisoformat(selected_date).weekday()
-        schedule = db.get_schedule()
-        day_schedule = next((s for s in schedule if s['day_of_week'] == day_of_week), None)
+        # Свободные слоты с учетом записей и длительности услуги
+        duration = await self._service_duration(context.user_data.get('selected_service'))
+        day_schedule, _, slots = await db.run(day_availability, selected_date, duration, now=datetime.now())
 
-        if not day_schedule or not day_schedule.get('is_working'):
+        if not day_schedule:
             await query.edit_message_text("❌ В этот день нет работы")
             return
 
-        start_time = datetime.strptime(day_schedule['start_time'], '%H:%M').time()
-        end_time = datetime.strptime(day_schedule['end_time'], '%H:%M').time()
-
-        # Генерируем слоты с шагом 30 минут
-        current_time = datetime.combine(date.today(), start_time)
-        end_datetime = datetime.combine(date.today(), end_time)
+        if not slots:
+            await query.edit_message_text(
+                "😕 На эту дату нет свободного времени",
+                reply_markup=self._back_button("book")
+            )
+            return
 
         keyboard = []
-        while current_time < end_datetime:
-            time_str = current_time.strftime('%H:%M')
+        for time_str in slots:
             keyboard.append([InlineKeyboardButton(f"🕐 {time_str}", callback_data=f"time_{time_str}")])
-            current_time += timedelta(minutes=30)
 
         keyboard.append([InlineKeyboardButton("◀️ Назад", callback_data=f"date_{selected_date}")])
 
@@ -384,8 +638,7 @@ class BotInstance:
         )
 
     async def confirm_booking(self, query, context):
-        from .models import DatabaseManager
-        db = DatabaseManager(self.master_id)
+        db = self._db()
 
         service_id = context.user_data.get('selected_service')
         date_str = context.user_data.get('selected_date')
@@ -395,13 +648,13 @@ class BotInstance:
             await query.edit_message_text("❌ Не все данные выбраны")
             return
 
-        service = db.get_service(service_id)
+        service = await db.get_service(service_id)
         if not service:
             await query.edit_message_text("❌ Услуга не найдена")
             return
 
         user = query.from_user
-        client = db.get_client_by_telegram(str(user.id))
+        client = await db.get_client_by_telegram(str(user.id))
 
         if not client:
             context.user_data['temp_booking'] = {
@@ -441,8 +694,7 @@ class BotInstance:
         )
 
     async def save_booking(self, query, context):
-        from .models import DatabaseManager
-        db = DatabaseManager(self.master_id)
+        db = self._db()
 
         service_id = context.user_data.get('selected_service')
         date_str = context.user_data.get('selected_date')
@@ -453,7 +705,7 @@ class BotInstance:
             return
 
         user = query.from_user
-        client = db.get_client_by_telegram(str(user.id))
+        client = await db.get_client_by_telegram(str(user.id))
 
         if not client:
             # Создаём нового клиента
@@ -463,11 +715,11 @@ class BotInstance:
                 'telegram_id': str(user.id),
                 'telegram_notifications': 1
             }
-            client_id = db.add_client(client_data)
-            client = db.get_client(client_id)
-            await self.notify_admin_about_new_client(context, client)
+            client_id = await db.add_client(client_data)
+            client = await db.get_client(client_id)
+            self.notify_admin_about_new_client(client)
 
-        service = db.get_service(service_id)
+        service = await db.get_service(service_id)
         if not service:
             await query.edit_message_text("❌ Услуга не найдена")
             return
@@ -482,11 +734,21 @@ class BotInstance:
             'notes': 'Запись через Telegram бота'
         }
 
-        booking_id = db.add_booking(booking_data)
-        booking = db.get_booking(booking_id)
+        booking_id = await db.reserve_booking(booking_data)
+        if not booking_id:
+            # Время успели занять, пока клиент подтверждал запись
+            context.user_data.pop('selected_time', None)
+            await query.edit_message_text(
+                "😕 Это время уже заняли. Выберите другое:",
+                reply_markup=InlineKeyboardMarkup([[
+                    InlineKeyboardButton("🕐 Выбрать время", callback_data=f"date_{date_str}")
+                ]])
+            )
+            return
+        booking = await db.get_booking(booking_id)
 
         # Отправляем уведомление админу
-        await self.notify_admin_about_new_booking(context, booking, client, service)
+        self.notify_admin_about_new_booking(booking, client, service)
 
         # Отправляем подтверждение клиенту
         await query.edit_message_text(
@@ -505,20 +767,19 @@ class BotInstance:
         self._clear_user_data(context)
 
     async def cancel_booking(self, query, context, booking_id):
-        from .models import DatabaseManager
-        db = DatabaseManager(self.master_id)
+        db = self._db()
 
-        booking = db.get_booking(booking_id)
+        booking = await db.get_booking(booking_id)
         if not booking or booking['status'] != 'confirmed':
             await query.edit_message_text("❌ Запись не найдена или уже отменена")
             return
 
-        db.update_booking(booking_id, {'status': 'cancelled'})
+        await db.update_booking(booking_id, {'status': 'cancelled'})
 
-        client = db.get_client(booking['client_id'])
-        service = db.get_service(booking['service_id'])
+        client = await db.get_client(booking['client_id'])
+        service = await db.get_service(booking['service_id'])
 
-        await self.notify_admin_about_cancellation(context, booking, client, service)
+        self.notify_admin_about_cancellation(booking, client, service)
 
         await query.edit_message_text(
             f"✅ **Запись отменена**\n\n"
@@ -531,10 +792,9 @@ class BotInstance:
         )
 
     async def admin_cancel_booking(self, query, context, booking_id):
-        from .models import DatabaseManager
-        db = DatabaseManager(self.master_id)
+        db = self._db()
 
-        booking = db.get_booking(booking_id)
+        booking = await db.get_booking(booking_id)
         if not booking:
             await query.edit_message_text("❌ Запись не найдена")
             return
@@ -543,27 +803,20 @@ class BotInstance:
             await query.edit_message_text("❌ Запись уже отменена")
             return
 
-        db.update_booking(booking_id, {'status': 'cancelled_by_admin'})
+        await db.update_booking(booking_id, {'status': 'cancelled_by_admin'})
 
-        client = db.get_client(booking['client_id'])
-        service = db.get_service(booking['service_id'])
+        client = await db.get_client(booking['client_id'])
+        service = await db.get_service(booking['service_id'])
 
         # Уведомление клиенту
         if client.get('telegram_id') and client.get('telegram_notifications', 1):
-            try:
-                message = (
-                    f"❌ Ваша запись отменена администратором\n\n"
-                    f"💇 Услуга: {service['name']}\n"
-                    f"📅 Дата: {booking['date']} {booking['time']}\n\n"
-                    f"Свяжитесь с нами для деталей."
-                )
-                await context.bot.send_message(
-                    chat_id=client['telegram_id'],
-                    text=message
-                )
-                logger.info(f"✅ Уведомление клиенту {client['telegram_id']} отправлено")
-            except Exception as e:
-                logger.error(f"Ошибка уведомления клиента {client['telegram_id']}: {e}")
+            message = (
+                f"❌ Ваша запись отменена администратором\n\n"
+                f"💇 Услуга: {service['name']}\n"
+                f"📅 Дата: {booking['date']} {booking['time']}\n\n"
+                f"Свяжитесь с нами для деталей."
+            )
+            self._send_later(client['telegram_id'], message, parse_mode=None)
 
         await query.edit_message_text(
             "✅ Запись отменена, клиент уведомлён",
@@ -573,11 +826,10 @@ class BotInstance:
         )
 
     async def show_my_bookings(self, query, context):
-        from .models import DatabaseManager
-        db = DatabaseManager(self.master_id)
+        db = self._db()
 
         user_id = query.from_user.id
-        client = db.get_client_by_telegram(str(user_id))
+        client = await db.get_client_by_telegram(str(user_id))
         if not client:
             await query.edit_message_text(
                 "📭 У вас пока нет записей.",
@@ -587,9 +839,12 @@ class BotInstance:
             )
             return
 
-        today = date.today().isoformat()
-        all_bookings = db.get_bookings(client_id=client['id'])
-        upcoming = [b for b in all_bookings if b['date'] >= today and b['status'] == 'confirmed']
+        # На одну запись больше лимита — чтобы знать, есть ли еще
+        upcoming = await db.get_client_upcoming_bookings(
+            client['id'], date.today().isoformat(), MY_BOOKINGS_LIMIT + 1
+        )
+        more = len(upcoming) > MY_BOOKINGS_LIMIT
+        upcoming = upcoming[:MY_BOOKINGS_LIMIT]
 
         if not upcoming:
             await query.edit_message_text(
@@ -603,12 +858,13 @@ class BotInstance:
         text = "📋 **Ваши записи:**\n\n"
         keyboard = []
         for b in upcoming:
-            service = db.get_service(b['service_id'])
-            text += f"📅 {b['date']} {b['time']}\n💇 {service['name']}\n\n"
+            text += f"📅 {b['date']} {b['time']}\n💇 {b['service_name']}\n\n"
             keyboard.append([InlineKeyboardButton(
                 f"❌ Отменить {b['date']} {b['time']}",
                 callback_data=f"cancel_booking_{b['id']}"
             )])
+        if more:
+            text += f"Показаны ближайшие {MY_BOOKINGS_LIMIT} записей.\n"
 
         keyboard.append([InlineKeyboardButton("◀️ Назад", callback_data="main_menu")])
 
@@ -627,16 +883,9 @@ class BotInstance:
         elif context.user_data.get('contact_admin'):
             await self.send_to_admin(update, context, text)
         else:
-            keyboard = [
-                [InlineKeyboardButton("📅 Записаться", callback_data="book")],
-                [InlineKeyboardButton("📋 Мои записи", callback_data="my_bookings")],
-                [InlineKeyboardButton("ℹ️ Услуги", callback_data="services")],
-                [InlineKeyboardButton("📞 Контакты", callback_data="contacts")],
-                [InlineKeyboardButton("📨 Связаться с админом", callback_data="contact_admin")],
-            ]
             await update.message.reply_text(
                 "👋 Используйте кнопки меню:",
-                reply_markup=InlineKeyboardMarkup(keyboard)
+                reply_markup=self._main_menu(user.id)
             )
 
     async def handle_registration(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
@@ -644,8 +893,7 @@ class BotInstance:
         step = context.user_data.get('reg_step')
         temp = context.user_data.get('temp_booking', {})
 
-        from .models import DatabaseManager
-        db = DatabaseManager(self.master_id)
+        db = self._db()
 
         # Шаг 1: Имя
         if step == 'name':
@@ -768,11 +1016,14 @@ class BotInstance:
                 'notes': f'Зарегистрирован через бота {datetime.now().strftime("%d.%m.%Y")}'
             }
 
-            client_id = db.add_client(client_data)
-            client = db.get_client(client_id)
+            client_id = await db.add_client(client_data)
+            client = await db.get_client(client_id)
+
+            # Данные регистрации больше не нужны; выбранная запись восстанавливается из temp ниже
+            self._clear_user_data(context)
 
             # Уведомление админу
-            await self.notify_admin_about_new_client(context, client)
+            self.notify_admin_about_new_client(client)
 
             # Приветственное сообщение
             await update.message.reply_text(
@@ -790,9 +1041,8 @@ class BotInstance:
                 context.user_data['selected_service'] = temp.get('service_id')
                 context.user_data['selected_date'] = temp.get('date')
                 context.user_data['selected_time'] = temp.get('time')
-                context.user_data.pop('temp_booking', None)
 
-                service = db.get_service(temp['service_id'])
+                service = await db.get_service(temp['service_id'])
                 text_confirm = (
                     f"📋 **Подтверждение записи**\n\n"
                     f"💇 Услуга: {service['name']}\n"
@@ -816,50 +1066,38 @@ class BotInstance:
                 )
             else:
                 # Показываем меню
-                keyboard = [
-                    [InlineKeyboardButton("📅 Записаться", callback_data="book")],
-                    [InlineKeyboardButton("📋 Мои записи", callback_data="my_bookings")],
-                    [InlineKeyboardButton("ℹ️ Услуги", callback_data="services")],
-                    [InlineKeyboardButton("📞 Контакты", callback_data="contacts")],
-                    [InlineKeyboardButton("📨 Связаться с админом", callback_data="contact_admin")],
-                ]
                 await update.message.reply_text(
                     "👋 **Главное меню:**\n\nВыберите действие:",
-                    reply_markup=InlineKeyboardMarkup(keyboard),
+                    reply_markup=self._main_menu(update.effective_user.id),
                     parse_mode='Markdown'
                 )
 
-            self._clear_user_data(context)
-
     async def send_to_admin(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
         if not self.admin_id:
             await update.message.reply_text("❌ Админ не настроен")
             return
 
         user = update.effective_user
-        from .models import DatabaseManager
-        db = DatabaseManager(self.master_id)
-        client = db.get_client_by_telegram(str(user.id))
+        db = self._db()
+        client = await db.get_client_by_telegram(str(user.id))
         client_name = client['name'] if client else user.first_name
 
-        try:
-            await context.bot.send_message(
-                chat_id=self.admin_id,
-                text=f"📨 **Сообщение от клиента**\n\n"
-                     f"👤 Клиент: {client_name}\n"
-                     f"🆔 ID: {user.id}\n"
-                     f"📱 Username: @{user.username if user.username else 'нет'}\n\n"
-                     f"💬 **Сообщение:**\n{text}",
-                parse_mode='Markdown'
-            )
+        queued = self._send_later(
+            self.admin_id,
+            f"📨 **Сообщение от клиента**\n\n"
+            f"👤 Клиент: {md(client_name)}\n"
+            f"🆔 ID: {user.id}\n"
+            f"📱 Username: {md('@' + user.username) if user.username else 'нет'}\n\n"
+            f"💬 **Сообщение:**\n{md(text)}"
+        )
+        if queued:
             await update.message.reply_text(
                 "✅ Сообщение отправлено администратору!",
                 reply_markup=InlineKeyboardMarkup([[
                     InlineKeyboardButton("◀️ В меню", callback_data="main_menu")
                 ]])
             )
-        except Exception as e:
-            logger.error(f"Ошибка отправки админу: {e}")
+        else:
             await update.message.reply_text("❌ Ошибка отправки")
 
         self._clear_user_data(context)
@@ -873,7 +1111,15 @@ class BotInstance:
     def _back_button(self, callback_data):
         return InlineKeyboardMarkup([[InlineKeyboardButton("◀️ Назад", callback_data=callback_data)]])
 
-    async def notify_admin_about_new_booking(self, context, booking, client, service):
+    def _send_later(self, chat_id, text: str, parse_mode: str | None = 'Markdown') -> bool:
+        """Поставить сообщение в очередь отправки бота, не дожидаясь Telegram"""
+        if not self.outbox:
+            logger.warning(f"⚠️ [МАСТЕР {self.master_id}] Очередь сообщений не запущена")
+            return False
+        self.outbox.enqueue(chat_id, text, parse_mode)
+        return True
+
+    def notify_admin_about_new_booking(self, booking, client, service):
         """Уведомление администратора о новой записи"""
         try:
             if not self.admin_id or str(self.admin_id).strip() == '':
@@ -883,10 +1129,10 @@ class BotInstance:
             message = (
                 f"🆕 **НОВАЯ ЗАПИСЬ!**\n\n"
                 f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-                f"👤 **Клиент:** {client['name']}\n"
-                f"📞 **Телефон:** {client.get('phone', 'не указан')}\n"
-                f"📧 **Email:** {client.get('email', 'не указан')}\n\n"
-                f"💇 **Услуга:** {service['name']}\n"
+                f"👤 **Клиент:** {md(client['name'])}\n"
+                f"📞 **Телефон:** {md(client.get('phone', 'не указан'))}\n"
+                f"📧 **Email:** {md(client.get('email', 'не указан'))}\n\n"
+                f"💇 **Услуга:** {md(service['name'])}\n"
                 f"💰 **Цена:** {service['price']}₽\n"
                 f"📅 **Дата:** {booking['date']}\n"
                 f"🕐 **Время:** {booking['time']}\n\n"
@@ -894,72 +1140,13 @@ class BotInstance:
                 f"🆔 **ID записи:** `{booking['id']}`"
             )
 
-            await context.bot.send_message(
-                chat_id=self.admin_id,
-                text=message,
-                parse_mode='Markdown'
-            )
-            logger.info(f"✅ Уведомление о новой записи отправлено админу {self.admin_id}")
+            if self._send_later(self.admin_id, message):
+                logger.info(f"✅ Уведомление о новой записи поставлено в очередь для админа {self.admin_id}")
 
         except Exception as e:
             logger.error(f"❌ Ошибка отправки уведомления админу: {e}")
 
-async def notify_admin_about_cancellation(self, context, booking, client, service):
-    """Уведомление администратора об отмене записи"""
-    try:
-        if not self.admin_id or str(self.admin_id).strip() == '':
-            return
-
-        message = (
-            f"❌ **ЗАПИСЬ ОТМЕНЕНА!**\n\n"
-            f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-            f"👤 **Клиент:** {client['name']}\n"
-            f"📞 **Телефон:** {client.get('phone', 'не указан')}\n\n"
-            f"💇 **Услуга:** {service['name']}\n"
-            f"📅 **Дата:** {booking['date']}\n"
-            f"🕐 **Время:** {booking['time']}\n\n"
-            f"━━━━━━━━━━━━━━━━━━━━━\n"
-            f"🆔 **ID записи:** `{booking['id']}`"
-        )
-
-        await context.bot.send_message(
-            chat_id=self.admin_id,
-            text=message,
-            parse_mode='Markdown'
-        )
-        logger.info(f"✅ Уведомление об отмене отправлено админу {self.admin_id}")
-
-    except Exception as e:
-        logger.error(f"❌ Ошибка отправки уведомления об отмене: {e}")
-
-async def notify_admin_about_new_client(self, context, client):
-    """Уведомление администратора о новом клиенте"""
-    try:
-        if not self.admin_id or str(self.admin_id).strip() == '':
-            return
-
-        message = (
-            f"👋 **НОВЫЙ КЛИЕНТ!**\n\n"
-            f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-            f"👤 **Имя:** {client['name']}\n"
-            f"📞 **Телефон:** {client.get('phone', 'не указан')}\n"
-            f"📧 **Email:** {client.get('email', 'не указан')}\n"
-            f"🎂 **День рождения:** {client.get('birth_date', 'не указан')}\n"
-            f"🆔 **Telegram ID:** `{client.get('telegram_id', 'не указан')}`\n\n"
-            f"━━━━━━━━━━━━━━━━━━━━━"
-        )
-
-        await context.bot.send_message(
-            chat_id=self.admin_id,
-            text=message,
-            parse_mode='Markdown'
-        )
-        logger.info(f"✅ Уведомление о новом клиенте отправлено админу {self.admin_id}")
-
-    except Exception as e:
-        logger.error(f"❌ Ошибка отправки уведомления о новом клиенте: {e}")
-
-    async def notify_admin_about_cancellation(self, context, booking, client, service):
+    def notify_admin_about_cancellation(self, booking, client, service):
         """Уведомление администратора об отмене записи"""
         try:
             if not self.admin_id:
@@ -968,26 +1155,22 @@ async def notify_admin_about_new_client(self, context, client):
             message = (
                 f"❌ **ЗАПИСЬ ОТМЕНЕНА!**\n\n"
                 f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-                f"👤 **Клиент:** {client['name']}\n"
-                f"📞 **Телефон:** {client.get('phone', 'не указан')}\n\n"
-                f"💇 **Услуга:** {service['name']}\n"
+                f"👤 **Клиент:** {md(client['name'])}\n"
+                f"📞 **Телефон:** {md(client.get('phone', 'не указан'))}\n\n"
+                f"💇 **Услуга:** {md(service['name'])}\n"
                 f"📅 **Дата:** {booking['date']}\n"
                 f"🕐 **Время:** {booking['time']}\n\n"
                 f"━━━━━━━━━━━━━━━━━━━━━\n"
                 f"🆔 **ID записи:** `{booking['id']}`"
             )
 
-            await context.bot.send_message(
-                chat_id=self.admin_id,
-                text=message,
-                parse_mode='Markdown'
-            )
-            logger.info(f"✅ Уведомление об отмене отправлено админу {self.admin_id}")
+            if self._send_later(self.admin_id, message):
+                logger.info(f"✅ Уведомление об отмене поставлено в очередь для админа {self.admin_id}")
 
         except Exception as e:
             logger.error(f"❌ Ошибка отправки уведомления об отмене: {e}")
 
-    async def notify_admin_about_new_client(self, context, client):
+    def notify_admin_about_new_client(self, client):
         """Уведомление администратора о новом клиенте"""
         try:
             if not self.admin_id:
@@ -996,20 +1179,16 @@ async def notify_admin_about_new_client(self, context, client):
             message = (
                 f"👋 **НОВЫЙ КЛИЕНТ!**\n\n"
                 f"━━━━━━━━━━━━━━━━━━━━━\n\n"
-                f"👤 **Имя:** {client['name']}\n"
-                f"📞 **Телефон:** {client.get('phone', 'не указан')}\n"
-                f"📧 **Email:** {client.get('email', 'не указан')}\n"
-                f"🎂 **День рождения:** {client.get('birth_date', 'не указан')}\n"
+                f"👤 **Имя:** {md(client['name'])}\n"
+                f"📞 **Телефон:** {md(client.get('phone', 'не указан'))}\n"
+                f"📧 **Email:** {md(client.get('email', 'не указан'))}\n"
+                f"🎂 **День рождения:** {md(client.get('birth_date', 'не указан'))}\n"
                 f"🆔 **Telegram ID:** `{client.get('telegram_id', 'не указан')}`\n\n"
                 f"━━━━━━━━━━━━━━━━━━━━━"
             )
 
-            await context.bot.send_message(
-                chat_id=self.admin_id,
-                text=message,
-                parse_mode='Markdown'
-            )
-            logger.info(f"✅ Уведомление о новом клиенте отправлено админу {self.admin_id}")
+            if self._send_later(self.admin_id, message):
+                logger.info(f"✅ Уведомление о новом клиенте поставлено в очередь для админа {self.admin_id}")
 
         except Exception as e:
             logger.error(f"❌ Ошибка отправки уведомления о новом клиенте: {e}")
@@ -1027,32 +1206,165 @@ async def notify_admin_about_new_client(self, context, client):
 
 
 class BotManager:
-    """Менеджер нескольких ботов"""
+    """Менеджер нескольких ботов.
 
-    def __init__(self, plugin):
+    Все боты мастеров работают как задачи в loop_count общих event loop,
+    поэтому число потоков не зависит от числа мастеров.
+    """
+
+    def __init__(self, plugin, loop_count: int = 1, webhook_url: str | None = None,
+                 api_base_url: str | None = None, reminder_interval: float = REMINDER_INTERVAL,
+                 reminder_lead_hours: int = REMINDER_LEAD_HOURS,
+                 agenda_time: time_type | str | None = AGENDA_TIME):
         self.plugin = plugin
+        self.loop_count = max(1, loop_count)
+        self.webhook_url = webhook_url
+        self.api_base_url = api_base_url
+        self.loops: list[BotLoop] = []
         self.bots: dict[str, BotInstance] = {}
+        # Сегмент URL webhook -> master_id
+        self.webhook_routes: dict[str, str] = {}
+        # Боты, которые еще останавливаются после замены или отключения
+        self.stopping: dict[str, BotInstance] = {}
+        # Планировщик напоминаний на каждый event loop (0 — рассылка отключена)
+        self.reminder_interval = reminder_interval
+        self.reminder_lead_hours = reminder_lead_hours
+        if isinstance(agenda_time, str):
+            agenda_time = time_type.fromisoformat(agenda_time)
+        self.agenda_time = agenda_time
+        self.reminders: list[ReminderScheduler] = []
+        self.reminder_stats: dict[str, dict] = {}
+        self._lock = threading.Lock()
         logger.info("🤖 Менеджер ботов инициализирован")
 
+    def _pick_loop(self) -> BotLoop:
+        """Наименее загруженный event loop (потоки создаются по мере надобности)"""
+        with self._lock:
+            if len(self.loops) < self.loop_count:
+                bot_loop = BotLoop(f"bot-loop-{len(self.loops)}")
+                bot_loop.start()
+                self.loops.append(bot_loop)
+                if self.reminder_interval:
+                    scheduler = ReminderScheduler(self, bot_loop, self.reminder_interval,
+                                                  self.reminder_lead_hours)
+                    scheduler.start()
+                    self.reminders.append(scheduler)
+                return bot_loop
+            return min(self.loops, key=lambda l: len(l.bots))
+
     def start_bot(self, master_id: str, token: str, admin_id: str | None):
-        self.stop_bot(master_id)
-        bot = BotInstance(master_id, token, admin_id, self.plugin)
-        bot.start()
-        self.bots[master_id] = bot
+        """Запустить бота мастера, заменив прежний. Не ждет ни остановки, ни запуска"""
+        bot = BotInstance(master_id, token, admin_id, self.plugin,
+                          webhook_url=self.webhook_url, api_base_url=self.api_base_url,
+                          agenda_time=self.agenda_time)
+        previous = self.stop_bot(master_id, wait=False)
+        bot_loop = self._pick_loop()
+        with self._lock:
+            bot_loop.bots.add(master_id)
+            self.bots[master_id] = bot
+            self.webhook_routes[bot.webhook_path] = master_id
+        bot.start(bot_loop, after=previous)
         return True
 
-    def stop_bot(self, master_id: str):
-        if master_id in self.bots:
-            self.bots[master_id].stop()
-            del self.bots[master_id]
+    def stop_bot(self, master_id: str, wait: bool = True):
+        """Остановить бота мастера.
+
+        При wait=False возвращает future остановки (или None), не дожидаясь ее.
+        """
+        with self._lock:
+            bot = self.bots.pop(master_id, None)
+            if not bot:
+                return False if wait else None
+            if self.webhook_routes.get(bot.webhook_path) == master_id:
+                del self.webhook_routes[bot.webhook_path]
+            self.stopping[master_id] = bot
+
+        def finished(_=None):
+            with self._lock:
+                if self.stopping.get(master_id) is bot:
+                    del self.stopping[master_id]
+                if bot.bot_loop and master_id not in self.bots:
+                    bot.bot_loop.bots.discard(master_id)
+
+        if wait:
+            bot.stop()
+            finished()
             return True
-        return False
+
+        future = bot.stop_async()
+        if future:
+            future.add_done_callback(finished)
+        else:
+            finished()
+        return future
+
+    def apply_config(self, master_id: str, token: str | None, admin_id: str | None,
+                     enabled: bool = True) -> dict:
+        """Применить настройки бота мастера, не блокируя вызывающий поток.
+
+        Смена admin_id применяется к работающему боту на месте; перезапуск
+        выполняется только при смене токена, остановка — при отключении бота.
+        Возвращает {'action': ..., 'state': ...}; дальнейшее состояние — status().
+        """
+        token = (token or '').strip()
+        bot = self.bots.get(master_id)
+
+        if not token or not enabled:
+            action = 'stopping' if bot else 'unchanged'
+            if bot:
+                self.stop_bot(master_id, wait=False)
+        elif bot and bot.token == token and bot.state in ('starting', 'running'):
+            action = 'unchanged'
+            if bot.admin_id != admin_id:
+                bot.admin_id = admin_id
+                action = 'updated'
+        else:
+            action = 'restarting' if bot else 'starting'
+            self.start_bot(master_id, token, admin_id)
+
+        return dict(self.status(master_id), action=action)
+
+    def status(self, master_id: str) -> dict:
+        """Состояние бота мастера: starting, running, failed, stopping или stopped"""
+        bot = self.bots.get(master_id)
+        if bot:
+            state = bot.state
+        elif master_id in self.stopping:
+            state = 'stopping'
+        else:
+            state = 'stopped'
+        return {
+            'state': state,
+            'running': state == 'running',
+            'pending': state in ('starting', 'stopping'),
+        }
+
+    def get_webhook_bot(self, path: str) -> BotInstance | None:
+        """Бот по сегменту URL webhook"""
+        master_id = self.webhook_routes.get(path)
+        return self.bots.get(master_id) if master_id is not None else None
+
+    def reminder_counters(self, master_id: str) -> dict:
+        """Счетчики напоминаний мастера"""
+        return self.reminder_stats.setdefault(str(master_id), new_counters())
 
     def restart_bot(self, master_id: str, token: str, admin_id: str | None):
-        self.stop_bot(master_id)
+        """Принудительный перезапуск (асинхронный, как и start_bot)"""
         return self.start_bot(master_id, token, admin_id)
 
     def stop_all(self):
         for master_id in list(self.bots.keys()):
             self.stop_bot(master_id)
-        logger.info("⏹ Все боты остановлены")
\ No newline at end of file
+        for bot in list(self.stopping.values()):
+            try:
+                bot.stop_future.result(timeout=8.0)
+            except Exception as e:
+                logger.error(f"Ошибка остановки бота {bot.master_id}: {e}")
+        for scheduler in self.reminders:
+            scheduler.stop()
+        self.reminders.clear()
+        for bot_loop in self.loops:
+            bot_loop.stop()
+        self.loops.clear()
+        async_db.shutdown()
+        logger.info("⏹ Все боты остановлены")
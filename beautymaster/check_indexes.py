@@ -0,0 +1,106 @@
+import sys
+import os
+import re
+import tempfile
+from datetime import date, datetime, timedelta
+
+# Добавляем путь к корневой папке проекта
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+from plugins.beautymaster.models import DatabaseManager
+
+# Таблицы, полный просмотр которых недопустим в фильтрующих запросах
+GUARDED_TABLES = ('bookings', 'b', 'services', 's', 'clients', 'c')
+
+# Запросы DatabaseManager: (название, вызов, таблицы с допустимым полным просмотром)
+today = date.today().isoformat()
+week_later = (date.today() + timedelta(days=7)).isoformat()
+
+SCENARIOS = [
+    ('get_profile', lambda db: db.get_profile(), {'master_profile'}),
+    ('get_services', lambda db: db.get_services(), set()),
+    ('get_services(all)', lambda db: db.get_services(active_only=False), {'services'}),
+    ('get_service', lambda db: db.get_service(1), set()),
+    ('get_clients', lambda db: db.get_clients(), {'clients', 'c', 'bookings'}),
+    ('get_client', lambda db: db.get_client(1), set()),
+    ('get_client_by_telegram', lambda db: db.get_client_by_telegram('42'), set()),
+    ('get_schedule', lambda db: db.get_schedule(), {'schedule'}),
+    ('get_bookings(date range)', lambda db: db.get_bookings(date_from=today, date_to=week_later), set()),
+    ('get_bookings(client)', lambda db: db.get_bookings(client_id=1), set()),
+    ('get_bookings(status)', lambda db: db.get_bookings(status='confirmed'), set()),
+    ('get_client_upcoming_bookings', lambda db: db.get_client_upcoming_bookings(1, today), set()),
+    ('get_booking', lambda db: db.get_booking(1), set()),
+    ('get_bookings_for_date', lambda db: db.get_bookings_for_date(today), set()),
+    ('get_agenda', lambda db: db.get_agenda(today, week_later), set()),
+    ('get_busy_bookings', lambda db: db.get_busy_bookings(today), set()),
+    ('reserve_booking', lambda db: db.reserve_booking(
+        {'client_id': 1, 'service_id': 1, 'date': today, 'time': '10:00'}), set()),
+    ('update_booking', lambda db: db.update_booking(1, {'time': '11:00'}), set()),
+    ('get_upcoming_bookings', lambda db: db.get_upcoming_bookings(), set()),
+    ('get_due_reminders', lambda db: db.get_due_reminders(datetime.now()), set()),
+    ('get_clients_for_notifications', lambda db: db.get_clients_for_notifications(), {'clients'}),
+    ('get_stats', lambda db: db.get_stats(), set()),
+    ('stored_version', lambda db: db.stored_version('profile', 'bookings'), set()),
+    ('get_bot_stats', lambda db: db.get_bot_stats(), set()),
+    ('get_daily_stats', lambda db: db.get_daily_stats(today, week_later), set()),
+]
+
+
+def collect_statements(db, call):
+    """Выполнить вызов и собрать все SELECT-запросы, отправленные в SQLite"""
+    statements = []
+    with db.connection() as conn:
+        conn.set_trace_callback(statements.append)
+        try:
+            call(db)
+        finally:
+            conn.set_trace_callback(None)
+    return [s for s in statements if s.lstrip().upper().startswith('SELECT')]
+
+
+def full_scans(db, sql):
+    """Таблицы, которые план запроса просматривает целиком"""
+    with db.connection() as conn:
+        plan = conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+
+    scanned = set()
+    for row in plan:
+        detail = row[3]
+        match = re.match(r'SCAN (\w+)(.*)', detail)
+        if match and 'USING' not in match.group(2) and match.group(1) in GUARDED_TABLES:
+            scanned.add(match.group(1))
+    return scanned
+
+
+def check_query_plans(db):
+    """Проверка планов запросов. Возвращает список регрессий"""
+    regressions = []
+    for name, call, allowed in SCENARIOS:
+        for sql in collect_statements(db, call):
+            scanned = full_scans(db, sql) - allowed
+            status = '✅' if not scanned else '❌'
+            print(f"{status} {name}: {', '.join(sorted(scanned)) or 'индекс'}")
+            if scanned:
+                regressions.append((name, sql, scanned))
+    return regressions
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("🔍 ПРОВЕРКА ПЛАНОВ ЗАПРОСОВ (EXPLAIN QUERY PLAN)")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager('plan_check', db_path=os.path.join(tmp, 'plans.db'))
+        regressions = check_query_plans(db)
+        db.close()
+
+    if regressions:
+        print(f"\n❌ Запросов без индекса: {len(regressions)}")
+        for name, sql, scanned in regressions:
+            print(f"\n{name} ({', '.join(sorted(scanned))}):\n{sql.strip()}")
+        sys.exit(1)
+
+    print("\n✅ Все запросы используют индексы")
@@ -0,0 +1,79 @@
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+# Добавляем путь к корневой папке проекта
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+from plugins.beautymaster.models import DatabaseManager, REMINDER_SENT
+
+
+def due_ids(db, now):
+    """ID записей, которым сейчас положено напоминание"""
+    return {b['id'] for b in db.get_due_reminders(now)}
+
+
+def check_reminders(db):
+    """Проверка повторных напоминаний после переноса записи. Возвращает список ошибок"""
+    errors = []
+    now = datetime.now().replace(second=0, microsecond=0)
+    tomorrow = now + timedelta(hours=12)
+    later = now + timedelta(hours=20)
+
+    client_id = db.add_client({'name': 'Клиент', 'phone': '+70000000000', 'telegram_id': '42'})
+    service_id = db.add_service({'name': 'Стрижка', 'price': 1000, 'duration': 60})
+    booking_id = db.add_booking({
+        'client_id': client_id,
+        'service_id': service_id,
+        'date': tomorrow.strftime('%Y-%m-%d'),
+        'time': tomorrow.strftime('%H:%M'),
+        'status': 'confirmed',
+    })
+
+    def expect(name, due):
+        ok = (booking_id in due_ids(db, now)) == due
+        print(f"{'✅' if ok else '❌'} {name}")
+        if not ok:
+            errors.append(name)
+
+    expect('новая запись ждет напоминания', True)
+
+    db.mark_reminders([booking_id], REMINDER_SENT)
+    expect('после отправки напоминание не повторяется', False)
+
+    db.update_booking(booking_id, {'status': 'completed'})
+    db.update_booking(booking_id, {'status': 'confirmed', 'notes': 'без переноса'})
+    expect('смена статуса без переноса не сбрасывает напоминание', False)
+
+    db.update_booking(booking_id, {
+        'date': later.strftime('%Y-%m-%d'),
+        'time': later.strftime('%H:%M'),
+    })
+    expect('после переноса напоминание отправляется снова', True)
+
+    db.mark_reminders([booking_id], REMINDER_SENT)
+    db.update_booking(booking_id, {'status': 'cancelled'})
+    db.update_booking(booking_id, {'status': 'confirmed'})
+    expect('после отмены и возврата записи напоминание отправляется снова', True)
+
+    return errors
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("🔔 ПРОВЕРКА НАПОМИНАНИЙ ПОСЛЕ ПЕРЕНОСА ЗАПИСИ")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager('reminder_check', db_path=os.path.join(tmp, 'reminders.db'))
+        errors = check_reminders(db)
+        db.close()
+
+    if errors:
+        print(f"\n❌ Ошибок: {len(errors)}")
+        sys.exit(1)
+
+    print("\n✅ Напоминания о перенесенных записях отправляются заново")
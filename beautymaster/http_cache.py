@@ -0,0 +1,30 @@
+from flask import current_app, jsonify, request
+
+# Сколько секунд браузер может показывать ответ без проверки на сервере
+CACHE_MAX_AGE = 10
+
+def cached_json(db, scopes, build, extra=None, max_age=CACHE_MAX_AGE):
+    """JSON-ответ с ETag по версиям данных db.stored_version(*scopes).
+
+    Версии хранятся в базе и растут от триггеров при любой записи, поэтому
+    ETag верен и при нескольких процессах. Если клиент прислал тот же ETag в
+    If-None-Match, возвращается 304 без вызова build() — ценой одного чтения
+    по первичному ключу вместо запросов за данными и сериализации. extra
+    добавляет к версии то, от чего ответ зависит помимо данных (например,
+    текущий месяц).
+    """
+    version = '.'.join(map(str, db.stored_version(*scopes)))
+    etag = f'{db.master_id}-{version}'
+    if extra is not None:
+        etag += f'-{extra}'
+
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    # Один URL отдает данные разных мастеров в зависимости от сессии
+    response.vary.add('Cookie')
+    return response
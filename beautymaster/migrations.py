@@ -0,0 +1,625 @@
+import sqlite3
+import os
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Версия схемы хранится в PRAGMA user_version каждой базы мастера.
+# Модуль не использует относительных импортов, чтобы его можно было
+# запускать отдельным скриптом: python migrations.py
+
+DATABASES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'databases')
+
+# Зарегистрированные миграции: (версия, описание, функция)
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Регистрация миграции схемы"""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+# ========== МИГРАЦИИ ==========
+
+@migration(1, 'Базовая схема')
+def _initial_schema(conn):
+    # Таблица профиля мастера
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS master_profile (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            salon_name TEXT,
+            phone TEXT,
+            address TEXT,
+            description TEXT,
+            telegram_bot_token TEXT,
+            telegram_admin_id TEXT,
+            telegram_notifications INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Старые базы создавались без полей бота
+    existing = _columns(conn, 'master_profile')
+    for column, definition in [
+        ('telegram_bot_token', 'TEXT'),
+        ('telegram_admin_id', 'TEXT'),
+        ('telegram_notifications', 'INTEGER DEFAULT 0'),
+    ]:
+        if column not in existing:
+            conn.execute(f'ALTER TABLE master_profile ADD COLUMN {column} {definition}')
+
+    # Таблица услуг
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS services (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            price REAL NOT NULL,
+            duration INTEGER DEFAULT 60,
+            category TEXT,
+            is_active INTEGER DEFAULT 1
+        )
+    ''')
+
+    # Таблица клиентов
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS clients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            email TEXT,
+            birth_date TEXT,
+            notes TEXT,
+            telegram_id TEXT UNIQUE,
+            telegram_notifications INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Таблица расписания
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schedule (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            day_of_week INTEGER NOT NULL,
+            start_time TEXT,
+            end_time TEXT,
+            is_working INTEGER DEFAULT 1
+        )
+    ''')
+
+    # Таблица бронирований
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bookings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id INTEGER NOT NULL,
+            service_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            duration INTEGER,
+            status TEXT DEFAULT 'confirmed',
+            notes TEXT,
+            reminder_sent INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (client_id) REFERENCES clients (id),
+            FOREIGN KEY (service_id) REFERENCES services (id)
+        )
+    ''')
+
+    # Таблица отзывов
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reviews (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id INTEGER NOT NULL,
+            booking_id INTEGER NOT NULL,
+            rating INTEGER,
+            comment TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (client_id) REFERENCES clients (id),
+            FOREIGN KEY (booking_id) REFERENCES bookings (id)
+        )
+    ''')
+
+
+# Вторичные индексы под горячие запросы
+INDEXES = {
+    'idx_bookings_date_time': 'bookings (date, time)',
+    'idx_bookings_client_date': 'bookings (client_id, date)',
+    'idx_bookings_status_date': 'bookings (status, date)',
+    'idx_bookings_service': 'bookings (service_id)',
+    'idx_bookings_reminder_due': "bookings (date, time) WHERE status = 'confirmed' AND reminder_sent = 0",
+    'idx_services_active_name': 'services (is_active, name)',
+    'idx_clients_name': 'clients (name)',
+}
+
+
+@migration(2, 'Индексы бронирований, клиентов и услуг')
+def _indexes(conn):
+    for name, definition in INDEXES.items():
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}')
+
+
+
+@migration(3, 'Очередь недоставленных исходящих сообщений бота')
+def _outbox(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id TEXT NOT NULL,
+            text TEXT NOT NULL,
+            parse_mode TEXT,
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+
+@migration(4, 'Состояние диалогов ботов (user_data, chat_data)')
+def _bot_state(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bot_state (
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            data TEXT NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (kind, key)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_bot_state_updated ON bot_state(updated_at)')
+
+
+
+# ========== СВОДНАЯ СТАТИСТИКА ==========
+# Счетчики stats_counters поддерживаются триггерами при любой записи. Ключи:
+#   clients, services_active, bookings,
+#   status:<статус>, month:<ГГГГ-ММ>, service:<id услуги>,
+#   clients:telegram, clients:subscribed, bookings:telegram (клиенты бота)
+
+def _bump(key, delta):
+    return (f"INSERT INTO stats_counters (key, value) VALUES ({key}, {delta}) "
+            f"ON CONFLICT(key) DO UPDATE SET value = value + excluded.value;")
+
+
+def _booking_keys(row):
+    return [
+        f"'status:' || COALESCE({row}.status, '')",
+        f"'month:' || substr(COALESCE({row}.date, ''), 1, 7)",
+        f"'service:' || COALESCE({row}.service_id, '')",
+    ]
+
+
+STATS_TRIGGERS = {
+    'stats_bookings_insert': 'AFTER INSERT ON bookings BEGIN '
+        + ' '.join(_bump(key, 1) for key in ["'bookings'"] + _booking_keys('NEW')) + ' END',
+    'stats_bookings_delete': 'AFTER DELETE ON bookings BEGIN '
+        + ' '.join(_bump(key, -1) for key in ["'bookings'"] + _booking_keys('OLD')) + ' END',
+    'stats_bookings_update': 'AFTER UPDATE OF status, date, service_id ON bookings BEGIN '
+        + ' '.join(_bump(key, -1) for key in _booking_keys('OLD')) + ' '
+        + ' '.join(_bump(key, 1) for key in _booking_keys('NEW')) + ' END',
+    'stats_clients_insert': 'AFTER INSERT ON clients BEGIN ' + _bump("'clients'", 1) + ' END',
+    'stats_clients_delete': 'AFTER DELETE ON clients BEGIN ' + _bump("'clients'", -1) + ' END',
+    'stats_services_insert': 'AFTER INSERT ON services BEGIN '
+        + _bump("'services_active'", '(NEW.is_active = 1)') + ' END',
+    'stats_services_delete': 'AFTER DELETE ON services BEGIN '
+        + _bump("'services_active'", '-(OLD.is_active = 1)') + ' END',
+    'stats_services_update': 'AFTER UPDATE OF is_active ON services BEGIN '
+        + _bump("'services_active'", '(NEW.is_active = 1) - (OLD.is_active = 1)') + ' END',
+}
+
+# Области данных, от которых зависит статистика; stats меняется только при пересчете
+STATS_SCOPES = ('bookings', 'clients', 'services', 'stats')
+
+# Те же счетчики, посчитанные заново по таблицам
+STATS_QUERY = '''
+    SELECT 'clients', COUNT(*) FROM clients
+    UNION ALL SELECT 'services_active', COUNT(*) FROM services WHERE is_active = 1
+    UNION ALL SELECT 'bookings', COUNT(*) FROM bookings
+    UNION ALL SELECT 'status:' || COALESCE(status, ''), COUNT(*) FROM bookings GROUP BY 1
+    UNION ALL SELECT 'month:' || substr(COALESCE(date, ''), 1, 7), COUNT(*) FROM bookings GROUP BY 1
+    UNION ALL SELECT 'service:' || COALESCE(service_id, ''), COUNT(*) FROM bookings GROUP BY 1
+    UNION ALL SELECT 'clients:telegram', COUNT(*) FROM clients WHERE COALESCE(telegram_id, '') != ''
+    UNION ALL SELECT 'clients:subscribed', COUNT(*) FROM clients
+              WHERE COALESCE(telegram_id, '') != '' AND COALESCE(telegram_notifications, 0) != 0
+    UNION ALL SELECT 'bookings:telegram', COUNT(*) FROM bookings b
+              JOIN clients c ON c.id = b.client_id WHERE COALESCE(c.telegram_id, '') != ''
+'''
+
+
+def rebuild_stats(conn):
+    """Пересчитать счетчики по таблицам (внутри транзакции вызывающего).
+
+    Возвращает расхождения {ключ: (было, стало)}.
+    """
+    expected = {key: value for key, value in conn.execute(STATS_QUERY) if value}
+    current = {key: value for key, value in conn.execute(
+        'SELECT key, value FROM stats_counters WHERE value != 0')}
+    diff = {
+        key: (current.get(key, 0), expected.get(key, 0))
+        for key in expected.keys() | current.keys()
+        if current.get(key, 0) != expected.get(key, 0)
+    }
+    conn.execute('DELETE FROM stats_counters')
+    conn.executemany('INSERT INTO stats_counters (key, value) VALUES (?, ?)', expected.items())
+    return diff
+
+
+@migration(5, 'Счетчики статистики, поддерживаемые триггерами')
+def _stats_counters(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    for name, definition in STATS_TRIGGERS.items():
+        conn.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {definition}')
+    rebuild_stats(conn)
+
+
+
+# ========== ДНЕВНЫЕ СВОДКИ ==========
+# daily_stats — итоги каждого дня: записи, отмены, выручка по текущим ценам
+# услуг и занятые минуты. Отмененные записи не дают выручки и минут.
+
+# Как CANCELLED_STATUSES и DEFAULT_DURATION в models.py / availability.py
+_CANCELLED_SQL = "('cancelled', 'cancelled_by_admin')"
+_DEFAULT_DURATION = 60
+
+
+def _daily_bump(row, sign):
+    active = f"(COALESCE({row}.status, '') NOT IN {_CANCELLED_SQL})"
+    price = f"COALESCE((SELECT price FROM services WHERE id = {row}.service_id), 0)"
+    minutes = (f"COALESCE({row}.duration, (SELECT duration FROM services WHERE id = {row}.service_id), "
+               f"{_DEFAULT_DURATION})")
+    return (
+        "INSERT INTO daily_stats (date, bookings, cancelled, revenue, booked_minutes) "
+        f"VALUES ({row}.date, {sign}, {sign} * (1 - {active}), "
+        f"{sign} * {active} * {price}, {sign} * {active} * {minutes}) "
+        "ON CONFLICT(date) DO UPDATE SET "
+        "bookings = bookings + excluded.bookings, cancelled = cancelled + excluded.cancelled, "
+        "revenue = revenue + excluded.revenue, booked_minutes = booked_minutes + excluded.booked_minutes;"
+    )
+
+
+def _daily_reprice(new_price, new_duration):
+    """Пересчет дней с записями на услугу OLD при смене ее цены или длительности"""
+    return (
+        "INSERT INTO daily_stats (date, revenue, booked_minutes) "
+        f"SELECT date, COUNT(*) * ({new_price} - OLD.price), "
+        f"SUM(duration IS NULL) * (COALESCE({new_duration}, {_DEFAULT_DURATION}) "
+        f"- COALESCE(OLD.duration, {_DEFAULT_DURATION})) "
+        f"FROM bookings WHERE service_id = OLD.id AND COALESCE(status, '') NOT IN {_CANCELLED_SQL} "
+        "GROUP BY date "
+        "ON CONFLICT(date) DO UPDATE SET "
+        "revenue = revenue + excluded.revenue, booked_minutes = booked_minutes + excluded.booked_minutes;"
+    )
+
+
+DAILY_TRIGGERS = {
+    'daily_bookings_insert': 'AFTER INSERT ON bookings BEGIN ' + _daily_bump('NEW', 1) + ' END',
+    'daily_bookings_delete': 'AFTER DELETE ON bookings BEGIN ' + _daily_bump('OLD', -1) + ' END',
+    'daily_bookings_update': 'AFTER UPDATE OF date, status, service_id, duration ON bookings BEGIN '
+        + _daily_bump('OLD', -1) + ' ' + _daily_bump('NEW', 1) + ' END',
+    # Триггеры bookings читают цену из services уже после изменения,
+    # поэтому здесь поправляем только прошлые дни этой услуги
+    'daily_services_update': 'AFTER UPDATE OF price, duration ON services BEGIN '
+        + _daily_reprice('NEW.price', 'NEW.duration') + ' END',
+    'daily_services_delete': 'AFTER DELETE ON services BEGIN '
+        + _daily_reprice('0', 'NULL') + ' END',
+}
+
+DAILY_QUERY = f'''
+    SELECT b.date, COUNT(*),
+           SUM(COALESCE(b.status, '') IN {_CANCELLED_SQL}),
+           SUM(CASE WHEN COALESCE(b.status, '') NOT IN {_CANCELLED_SQL}
+                    THEN COALESCE(s.price, 0) ELSE 0 END),
+           SUM(CASE WHEN COALESCE(b.status, '') NOT IN {_CANCELLED_SQL}
+                    THEN COALESCE(b.duration, s.duration, {_DEFAULT_DURATION}) ELSE 0 END)
+    FROM bookings b
+    LEFT JOIN services s ON s.id = b.service_id
+    GROUP BY b.date
+'''
+
+
+def rebuild_daily_stats(conn):
+    """Пересчитать daily_stats по таблицам (внутри транзакции вызывающего).
+
+    Возвращает расхождения {'day:<дата>': (было, стало)}, где значения —
+    кортежи (записи, отмены, выручка, минуты).
+    """
+    def normalize(row):
+        return (row[1], row[2], round(row[3], 2), row[4])
+
+    expected = {row[0]: normalize(row) for row in conn.execute(DAILY_QUERY)}
+    current = {row[0]: normalize(row) for row in conn.execute(
+        'SELECT date, bookings, cancelled, revenue, booked_minutes FROM daily_stats WHERE bookings != 0')}
+    empty = (0, 0, 0, 0)
+    diff = {
+        f'day:{day}': (current.get(day, empty), expected.get(day, empty))
+        for day in expected.keys() | current.keys()
+        if current.get(day, empty) != expected.get(day, empty)
+    }
+    conn.execute('DELETE FROM daily_stats')
+    conn.executemany(
+        'INSERT INTO daily_stats (date, bookings, cancelled, revenue, booked_minutes) VALUES (?, ?, ?, ?, ?)',
+        [(day, *values) for day, values in expected.items()]
+    )
+    return diff
+
+
+@migration(6, 'Дневные сводки записей, выручки и занятости')
+def _daily_stats(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            date TEXT PRIMARY KEY,
+            bookings INTEGER NOT NULL DEFAULT 0,
+            cancelled INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            booked_minutes INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    for name, definition in DAILY_TRIGGERS.items():
+        conn.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {definition}')
+    rebuild_daily_stats(conn)
+
+
+# ========== СЧЕТЧИКИ БОТА ==========
+# Ключи clients:telegram, clients:subscribed и bookings:telegram в stats_counters
+
+def _telegram(row):
+    return f"(COALESCE({row}.telegram_id, '') != '')"
+
+
+def _subscribed(row):
+    return f"({_telegram(row)} AND COALESCE({row}.telegram_notifications, 0) != 0)"
+
+
+def _client_bookings(row):
+    return f"(SELECT COUNT(*) FROM bookings WHERE client_id = {row}.id)"
+
+
+def _booking_telegram(row):
+    return f"COALESCE((SELECT {_telegram('c')} FROM clients c WHERE c.id = {row}.client_id), 0)"
+
+
+BOT_STATS_TRIGGERS = {
+    'stats_bot_clients_insert': 'AFTER INSERT ON clients BEGIN '
+        + _bump("'clients:telegram'", _telegram('NEW')) + ' '
+        + _bump("'clients:subscribed'", _subscribed('NEW')) + ' END',
+    'stats_bot_clients_delete': 'AFTER DELETE ON clients BEGIN '
+        + _bump("'clients:telegram'", '-' + _telegram('OLD')) + ' '
+        + _bump("'clients:subscribed'", '-' + _subscribed('OLD')) + ' '
+        + _bump("'bookings:telegram'", f"-{_telegram('OLD')} * {_client_bookings('OLD')}") + ' END',
+    'stats_bot_clients_update': 'AFTER UPDATE OF telegram_id, telegram_notifications ON clients BEGIN '
+        + _bump("'clients:telegram'", f"{_telegram('NEW')} - {_telegram('OLD')}") + ' '
+        + _bump("'clients:subscribed'", f"{_subscribed('NEW')} - {_subscribed('OLD')}") + ' END',
+    # Записи клиента переходят в «записи через бота» при привязке Telegram
+    'stats_bot_clients_link': 'AFTER UPDATE OF telegram_id ON clients '
+        + f"WHEN {_telegram('NEW')} != {_telegram('OLD')} BEGIN "
+        + _bump("'bookings:telegram'", f"({_telegram('NEW')} - {_telegram('OLD')}) * {_client_bookings('NEW')}")
+        + ' END',
+    'stats_bot_bookings_insert': 'AFTER INSERT ON bookings BEGIN '
+        + _bump("'bookings:telegram'", _booking_telegram('NEW')) + ' END',
+    'stats_bot_bookings_delete': 'AFTER DELETE ON bookings BEGIN '
+        + _bump("'bookings:telegram'", '-' + _booking_telegram('OLD')) + ' END',
+    'stats_bot_bookings_update': 'AFTER UPDATE OF client_id ON bookings BEGIN '
+        + _bump("'bookings:telegram'", f"{_booking_telegram('NEW')} - {_booking_telegram('OLD')}") + ' END',
+}
+
+
+@migration(7, 'Счетчики клиентов и записей через Telegram-бота')
+def _bot_stats_counters(conn):
+    for name, definition in BOT_STATS_TRIGGERS.items():
+        conn.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {definition}')
+    rebuild_stats(conn)
+
+
+# ========== ВЕРСИИ ДАННЫХ ==========
+# Версия области растет при любой записи в ее таблицу, из любого процесса.
+# Таблица -> область данных
+VERSIONED_TABLES = {
+    'master_profile': 'profile',
+    'services': 'services',
+    'clients': 'clients',
+    'schedule': 'schedule',
+    'bookings': 'bookings',
+}
+
+
+def bump_versions(conn, *scopes):
+    """Увеличить версии областей (для изменений в обход триггеров)"""
+    conn.executemany('UPDATE data_versions SET version = version + 1 WHERE scope = ?',
+                     [(scope,) for scope in scopes])
+
+
+@migration(8, 'Версии данных для кэширования ответов')
+def _data_versions(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            scope TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    conn.executemany('INSERT OR IGNORE INTO data_versions (scope, version) VALUES (?, 1)',
+                     [(scope,) for scope in (*VERSIONED_TABLES.values(), 'stats')])
+    for table, scope in VERSIONED_TABLES.items():
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS version_{table}_{event.lower()} AFTER {event} ON {table}
+                BEGIN UPDATE data_versions SET version = version + 1 WHERE scope = '{scope}'; END
+            ''')
+
+
+# ========== ПРИМЕНЕНИЕ ==========
+
+def latest_version():
+    """Последняя известная версия схемы"""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(conn):
+    """Текущая версия схемы базы"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    """Применить к базе все недостающие миграции.
+
+    Каждая миграция выполняется в отдельной транзакции вместе с обновлением
+    user_version. Возвращает пару (версия до, версия после).
+    """
+    start = current_version(conn)
+    if start >= latest_version():
+        return start, start
+
+    version = start
+    for number, description, func in MIGRATIONS:
+        if number <= version:
+            continue
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Другой процесс мог успеть применить миграцию, пока мы ждали блокировку
+            if current_version(conn) >= number:
+                conn.rollback()
+                version = current_version(conn)
+                continue
+            func(conn)
+            conn.execute(f'PRAGMA user_version = {number}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = number
+
+    return start, version
+
+
+def migrate_file(db_path):
+    """Миграция одного файла базы. Возвращает (путь, версия до, версия после)"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        start, end = migrate(conn)
+    finally:
+        conn.close()
+    return db_path, start, end
+
+
+def rebuild_stats_file(db_path):
+    """Пересчитать счетчики и дневные сводки одного файла. Возвращает (путь, расхождения)"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            diff = rebuild_stats(conn)
+            diff.update(rebuild_daily_stats(conn))
+            if diff:
+                # Статистика изменилась без записи в таблицы данных
+                bump_versions(conn, 'stats')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        conn.close()
+    return db_path, diff
+
+
+def find_databases(directory=DATABASES_DIR):
+    """Все файлы баз мастеров в папке"""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.startswith('master_') and name.endswith('.db')
+    )
+
+
+def migrate_all(directory=DATABASES_DIR, workers=None):
+    """Параллельная миграция всех баз мастеров в пуле процессов.
+
+    Возвращает список (путь, версия до, версия после, ошибка).
+    """
+    paths = find_databases(directory)
+    results = []
+    if not paths:
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(migrate_file, path): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                _, start, end = future.result()
+                results.append((path, start, end, None))
+            except Exception as e:
+                results.append((path, None, None, e))
+
+    return sorted(results, key=lambda r: r[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Миграция баз данных мастеров Beauty Master')
+    parser.add_argument('--dir', default=DATABASES_DIR, help='папка с файлами master_<id>.db')
+    parser.add_argument('--workers', type=int, default=None, help='количество процессов')
+    parser.add_argument('--rebuild-stats', action='store_true',
+                        help='пересчитать счетчики статистики и дневные сводки, показать расхождения')
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print(f"🔧 МИГРАЦИЯ БАЗ ДАННЫХ (схема v{latest_version()})")
+    print("=" * 60)
+
+    results = migrate_all(args.dir, args.workers)
+    if not results:
+        print(f"❌ Базы не найдены: {args.dir}")
+        return 1
+
+    failed = 0
+    for path, start, end, error in results:
+        name = os.path.basename(path)
+        if error:
+            failed += 1
+            print(f"❌ {name}: {error}")
+        elif start == end:
+            print(f"✅ {name}: v{end} (актуальна)")
+        else:
+            print(f"✅ {name}: v{start} → v{end}")
+
+    if args.rebuild_stats:
+        print("=" * 60)
+        print("📊 ПЕРЕСЧЕТ СТАТИСТИКИ")
+        for path, start, end, error in results:
+            if error:
+                continue
+            name = os.path.basename(path)
+            try:
+                _, diff = rebuild_stats_file(path)
+            except Exception as e:
+                failed += 1
+                print(f"❌ {name}: {e}")
+                continue
+            if not diff:
+                print(f"✅ {name}: счетчики сходятся")
+                continue
+            print(f"⚠️ {name}: исправлено расхождений: {len(diff)}")
+            for key, (old, new) in sorted(diff.items()):
+                print(f"   {key}: {old} → {new}")
+
+    print("=" * 60)
+    print(f"Готово: {len(results) - failed} из {len(results)}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
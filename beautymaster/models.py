@@ -1,383 +1,380 @@
 import sqlite3
 import os
-from datetime import datetime
+import threading
+import time
+import base64
+from datetime import datetime, timedelta
 import json
 
+from .pool import ConnectionPool
+from .migrations import bump_versions, migrate, rebuild_daily_stats, rebuild_stats
+from .availability import BusyIntervals, DEFAULT_DURATION, to_minutes
+
+# Пути к базам, для которых схема уже создана в этом процессе
+_initialized_paths = set()
+_init_lock = threading.Lock()
+
+# Настройки SQLite, применяемые к каждому новому соединению
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -8000,        # ~8 МБ кэша страниц
+    'mmap_size': 67108864,      # 64 МБ
+    'busy_timeout': 5000,       # мс ожидания блокировки
+    'temp_store': 'MEMORY',
+}
+
+# Статусы отмененных бронирований (не занимают время)
+CANCELLED_STATUSES = ('cancelled', 'cancelled_by_admin')
+# Поля записи, от которых зависит занятое ею время
+SLOT_FIELDS = ('service_id', 'date', 'time', 'duration')
+
+# Значения bookings.reminder_sent
+REMINDER_PENDING = 0
+REMINDER_SENT = 1
+REMINDER_SKIPPED = 2    # клиент без Telegram, отключил уведомления или заблокировал бота
+
+# Поля бронирования, доступные для выборки (поле -> выражение SQL)
+BOOKING_FIELDS = {
+    'id': 'b.id',
+    'client_id': 'b.client_id',
+    'service_id': 'b.service_id',
+    'date': 'b.date',
+    'time': 'b.time',
+    'duration': 'b.duration',
+    'status': 'b.status',
+    'notes': 'b.notes',
+    'reminder_sent': 'b.reminder_sent',
+    'created_at': 'b.created_at',
+    'client_name': 'c.name',
+    'service_name': 's.name',
+    'price': 's.price',
+}
+
+# Клиенты с количеством визитов и датой последнего визита
+CLIENTS_QUERY = '''
+    SELECT c.*,
+           COALESCE(v.total_visits, 0) as total_visits,
+           v.last_visit
+    FROM clients c
+    LEFT JOIN (
+        SELECT client_id, COUNT(*) as total_visits, MAX(date) as last_visit
+        FROM bookings
+        GROUP BY client_id
+    ) v ON v.client_id = c.id
+    ORDER BY c.name
+'''
+
+
+def _iter_rows(cursor, batch_size):
+    """Построчный обход курсора пачками по batch_size"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            yield dict(row)
+
+
 class DatabaseManager:
     """Менеджер базы данных для конкретного мастера"""
     
-    def __init__(self, master_id):
+    def __init__(self, master_id, pool_size=5, pragmas=None, db_path=None):
         self.master_id = master_id
-        self.db_path = os.path.join(os.path.dirname(__file__), 'databases', f'master_{master_id}.db')
+        self.db_path = db_path or os.path.join(os.path.dirname(__file__), 'databases', f'master_{master_id}.db')
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self.pool = ConnectionPool(self.db_path, max_size=pool_size,
+                                   on_connect=self._configure_connection)
+        # Очередь резервирований внутри процесса: потоки ждут здесь, а не
+        # опрашивают блокировку записи SQLite
+        self._reserve_lock = threading.Lock()
         
-        # Создаем папку databases если её нет
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        # Схема создается один раз на файл базы в рамках процесса
+        with _init_lock:
+            if self.db_path not in _initialized_paths:
+                # Создаем папку databases если её нет
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                
+                # Инициализируем базу данных
+                self.init_database()
+                _initialized_paths.add(self.db_path)
+    
+    def stored_version(self, *scopes):
+        """Версия данных областей scopes из таблицы data_versions.
         
-        # Инициализируем базу данных
-        self.init_database()
+        Версии растут от триггеров при любой записи, поэтому учитывают и
+        другие процессы (воркеры, скрипты миграций, CLI). Стоит одного чтения
+        по первичному ключу; по ним строятся ETag и ключи кэша бота.
+        """
+        with self.connection() as conn:
+            rows = dict(conn.execute(
+                f"SELECT scope, version FROM data_versions WHERE scope IN ({', '.join('?' * len(scopes))})",
+                scopes
+            ).fetchall())
+        return tuple(rows.get(scope, 0) for scope in scopes)
     
     def get_connection(self):
-        """Получить соединение с базой данных"""
+        """Получить отдельное (не из пула) соединение с базой данных"""
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
+        self._configure_connection(conn)
         return conn
     
+    def _configure_connection(self, conn):
+        """Применить PRAGMA-настройки к новому соединению"""
+        for name, value in self.pragmas.items():
+            if value is not None:
+                conn.execute(f'PRAGMA {name} = {value}')
+    
+    def connection(self):
+        """Соединение из пула (контекстный менеджер)"""
+        return self.pool.connection()
+    
+    def close(self):
+        """Закрыть соединения пула"""
+        self.pool.close_all()
+    
+    def checkpoint(self, mode='PASSIVE'):
+        """Перенести содержимое WAL-журнала в основной файл базы"""
+        with self.connection() as conn:
+            return tuple(conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone())
+    
     def init_database(self):
-        """Создание всех таблиц"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Таблица профиля мастера
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS master_profile (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                salon_name TEXT,
-                phone TEXT,
-                address TEXT,
-                description TEXT,
-                telegram_bot_token TEXT,
-                telegram_admin_id TEXT,
-                telegram_notifications INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Таблица услуг
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS services (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                description TEXT,
-                price REAL NOT NULL,
-                duration INTEGER DEFAULT 60,
-                category TEXT,
-                is_active INTEGER DEFAULT 1
-            )
-        ''')
-        
-        # Таблица клиентов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clients (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                phone TEXT NOT NULL,
-                email TEXT,
-                birth_date TEXT,
-                notes TEXT,
-                telegram_id TEXT UNIQUE,
-                telegram_notifications INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Таблица расписания
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS schedule (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                day_of_week INTEGER NOT NULL,
-                start_time TEXT,
-                end_time TEXT,
-                is_working INTEGER DEFAULT 1
-            )
-        ''')
-        
-        # Таблица бронирований
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS bookings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_id INTEGER NOT NULL,
-                service_id INTEGER NOT NULL,
-                date TEXT NOT NULL,
-                time TEXT NOT NULL,
-                duration INTEGER,
-                status TEXT DEFAULT 'confirmed',
-                notes TEXT,
-                reminder_sent INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (client_id) REFERENCES clients (id),
-                FOREIGN KEY (service_id) REFERENCES services (id)
-            )
-        ''')
-        
-        # Таблица отзывов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS reviews (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_id INTEGER NOT NULL,
-                booking_id INTEGER NOT NULL,
-                rating INTEGER,
-                comment TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (client_id) REFERENCES clients (id),
-                FOREIGN KEY (booking_id) REFERENCES bookings (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """Создание таблиц и применение недостающих миграций схемы"""
+        with self.connection() as conn:
+            migrate(conn)
         
         # Создаем начальные данные если их нет
         self.create_initial_data()
     
     def create_initial_data(self):
         """Создание начальных данных (профиль)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Проверяем есть ли профиль
-        cursor.execute('SELECT COUNT(*) FROM master_profile')
-        if cursor.fetchone()[0] == 0:
-            cursor.execute('''
-                INSERT INTO master_profile (salon_name, phone, address, description)
-                VALUES (?, ?, ?, ?)
-            ''', ('Мой салон', '', '', ''))
-        
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Проверяем есть ли профиль
+            cursor.execute('SELECT COUNT(*) FROM master_profile')
+            if cursor.fetchone()[0] == 0:
+                cursor.execute('''
+                    INSERT INTO master_profile (salon_name, phone, address, description)
+                    VALUES (?, ?, ?, ?)
+                ''', ('Мой салон', '', '', ''))
+            
+            conn.commit()
     
     # ========== ПРОФИЛЬ ==========
     
     def get_profile(self):
         """Получить профиль мастера"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM master_profile LIMIT 1')
-        profile = cursor.fetchone()
-        conn.close()
-        
-        if profile:
-            return dict(profile)
-        return None
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM master_profile LIMIT 1')
+            profile = cursor.fetchone()
+            
+            if profile:
+                return dict(profile)
+            return None
     
     def update_profile(self, data):
         """Обновить профиль мастера"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        fields = []
-        values = []
-        for key in ['salon_name', 'phone', 'address', 'description', 
-                   'telegram_bot_token', 'telegram_admin_id', 'telegram_notifications']:
-            if key in data:
-                fields.append(f"{key} = ?")
-                values.append(data[key])
-        
-        if fields:
-            cursor.execute(f'''
-                UPDATE master_profile SET {', '.join(fields)}
-            ''', values)
-            conn.commit()
-        
-        conn.close()
-        return self.get_profile()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            fields = []
+            values = []
+            for key in ['salon_name', 'phone', 'address', 'description', 
+                       'telegram_bot_token', 'telegram_admin_id', 'telegram_notifications']:
+                if key in data:
+                    fields.append(f"{key} = ?")
+                    values.append(data[key])
+            
+            if fields:
+                cursor.execute(f'''
+                    UPDATE master_profile SET {', '.join(fields)}
+                ''', values)
+                conn.commit()
+            
+            return self.get_profile()
     
     # ========== УСЛУГИ ==========
     
     def get_services(self, active_only=True):
         """Получить все услуги"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if active_only:
-            cursor.execute('SELECT * FROM services WHERE is_active = 1 ORDER BY name')
-        else:
-            cursor.execute('SELECT * FROM services ORDER BY name')
-        
-        services = cursor.fetchall()
-        conn.close()
-        return [dict(s) for s in services]
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            if active_only:
+                cursor.execute('SELECT * FROM services WHERE is_active = 1 ORDER BY name')
+            else:
+                cursor.execute('SELECT * FROM services ORDER BY name')
+            
+            services = cursor.fetchall()
+            return [dict(s) for s in services]
     
     def get_service(self, service_id):
         """Получить услугу по ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM services WHERE id = ?', (service_id,))
-        service = cursor.fetchone()
-        conn.close()
-        return dict(service) if service else None
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM services WHERE id = ?', (service_id,))
+            service = cursor.fetchone()
+            return dict(service) if service else None
     
     def add_service(self, data):
         """Добавить услугу"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO services (name, description, price, duration, category, is_active)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            data['name'],
-            data.get('description', ''),
-            data['price'],
-            data.get('duration', 60),
-            data.get('category', ''),
-            data.get('is_active', 1)
-        ))
-        conn.commit()
-        service_id = cursor.lastrowid
-        conn.close()
-        return service_id
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO services (name, description, price, duration, category, is_active)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (
+                data['name'],
+                data.get('description', ''),
+                data['price'],
+                data.get('duration', 60),
+                data.get('category', ''),
+                data.get('is_active', 1)
+            ))
+            conn.commit()
+            service_id = cursor.lastrowid
+            return service_id
     
     def update_service(self, service_id, data):
         """Обновить услугу"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        fields = []
-        values = []
-        for key in ['name', 'description', 'price', 'duration', 'category', 'is_active']:
-            if key in data:
-                fields.append(f"{key} = ?")
-                values.append(data[key])
-        
-        values.append(service_id)
-        cursor.execute(f'''
-            UPDATE services SET {', '.join(fields)} WHERE id = ?
-        ''', values)
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            fields = []
+            values = []
+            for key in ['name', 'description', 'price', 'duration', 'category', 'is_active']:
+                if key in data:
+                    fields.append(f"{key} = ?")
+                    values.append(data[key])
+            
+            values.append(service_id)
+            cursor.execute(f'''
+                UPDATE services SET {', '.join(fields)} WHERE id = ?
+            ''', values)
+            conn.commit()
     
     def delete_service(self, service_id):
         """Удалить услугу"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM services WHERE id = ?', (service_id,))
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM services WHERE id = ?', (service_id,))
+            conn.commit()
     
     # ========== КЛИЕНТЫ ==========
     
     def get_clients(self):
-        """Получить всех клиентов"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM clients ORDER BY name')
-        clients = cursor.fetchall()
-        conn.close()
-        
-        result = []
-        for c in clients:
-            client = dict(c)
-            # Получаем количество визитов
-            conn = self.get_connection()
+        """Получить всех клиентов (с количеством визитов и датой последнего)"""
+        with self.connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM bookings WHERE client_id = ?', (client['id'],))
-            client['total_visits'] = cursor.fetchone()[0]
-            
-            cursor.execute('SELECT MAX(date) FROM bookings WHERE client_id = ?', (client['id'],))
-            last_date = cursor.fetchone()[0]
-            client['last_visit'] = last_date
-            conn.close()
-            
-            result.append(client)
-        
-        return result
+            cursor.execute(CLIENTS_QUERY)
+            clients = cursor.fetchall()
+            return [dict(c) for c in clients]
+    
+    def iter_clients(self, batch_size=500):
+        """Клиенты по одному, без загрузки всего списка в память"""
+        with self.connection() as conn:
+            cursor = conn.execute(CLIENTS_QUERY)
+            yield from _iter_rows(cursor, batch_size)
     
     def get_client(self, client_id):
         """Получить клиента по ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM clients WHERE id = ?', (client_id,))
-        client = cursor.fetchone()
-        conn.close()
-        return dict(client) if client else None
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM clients WHERE id = ?', (client_id,))
+            client = cursor.fetchone()
+            return dict(client) if client else None
     
     def get_client_by_telegram(self, telegram_id):
         """Получить клиента по Telegram ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM clients WHERE telegram_id = ?', (telegram_id,))
-        client = cursor.fetchone()
-        conn.close()
-        return dict(client) if client else None
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM clients WHERE telegram_id = ?', (telegram_id,))
+            client = cursor.fetchone()
+            return dict(client) if client else None
     
     def add_client(self, data):
         """Добавить клиента"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO clients (name, phone, email, birth_date, notes, telegram_id, telegram_notifications)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            data['name'],
-            data['phone'],
-            data.get('email', ''),
-            data.get('birth_date'),
-            data.get('notes', ''),
-            data.get('telegram_id'),
-            data.get('telegram_notifications', 1)
-        ))
-        conn.commit()
-        client_id = cursor.lastrowid
-        conn.close()
-        return client_id
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO clients (name, phone, email, birth_date, notes, telegram_id, telegram_notifications)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                data['name'],
+                data['phone'],
+                data.get('email', ''),
+                data.get('birth_date'),
+                data.get('notes', ''),
+                data.get('telegram_id'),
+                data.get('telegram_notifications', 1)
+            ))
+            conn.commit()
+            client_id = cursor.lastrowid
+            return client_id
     
     def update_client(self, client_id, data):
         """Обновить клиента"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        fields = []
-        values = []
-        for key in ['name', 'phone', 'email', 'birth_date', 'notes', 'telegram_id', 'telegram_notifications']:
-            if key in data:
-                fields.append(f"{key} = ?")
-                values.append(data[key])
-        
-        values.append(client_id)
-        cursor.execute(f'''
-            UPDATE clients SET {', '.join(fields)} WHERE id = ?
-        ''', values)
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            fields = []
+            values = []
+            for key in ['name', 'phone', 'email', 'birth_date', 'notes', 'telegram_id', 'telegram_notifications']:
+                if key in data:
+                    fields.append(f"{key} = ?")
+                    values.append(data[key])
+            
+            values.append(client_id)
+            cursor.execute(f'''
+                UPDATE clients SET {', '.join(fields)} WHERE id = ?
+            ''', values)
+            conn.commit()
     
     def delete_client(self, client_id):
         """Удалить клиента"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM clients WHERE id = ?', (client_id,))
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM clients WHERE id = ?', (client_id,))
+            conn.commit()
     
     # ========== РАСПИСАНИЕ ==========
     
     def get_schedule(self):
         """Получить расписание"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM schedule ORDER BY day_of_week')
-        schedule = cursor.fetchall()
-        conn.close()
-        return [dict(s) for s in schedule]
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM schedule ORDER BY day_of_week')
+            schedule = cursor.fetchall()
+            return [dict(s) for s in schedule]
     
     def update_schedule(self, schedule_data):
         """Обновить расписание"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Очищаем старое расписание
-        cursor.execute('DELETE FROM schedule')
-        
-        # Добавляем новое
-        for item in schedule_data:
-            cursor.execute('''
-                INSERT INTO schedule (day_of_week, start_time, end_time, is_working)
-                VALUES (?, ?, ?, ?)
-            ''', (
-                item['day_of_week'],
-                item.get('start_time'),
-                item.get('end_time'),
-                item.get('is_working', 1)
-            ))
-        
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Очищаем старое расписание
+            cursor.execute('DELETE FROM schedule')
+            
+            # Добавляем новое
+            for item in schedule_data:
+                cursor.execute('''
+                    INSERT INTO schedule (day_of_week, start_time, end_time, is_working)
+                    VALUES (?, ?, ?, ?)
+                ''', (
+                    item['day_of_week'],
+                    item.get('start_time'),
+                    item.get('end_time'),
+                    item.get('is_working', 1)
+                ))
+            
+            conn.commit()
     
     # ========== БРОНИРОВАНИЯ ==========
     
-    def get_bookings(self, date_from=None, date_to=None, status=None, client_id=None):
-        """Получить бронирования с фильтрами"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
+    def _bookings_query(self, date_from=None, date_to=None, status=None, client_id=None):
         query = '''
             SELECT b.*, c.name as client_name, s.name as service_name, s.price
             FROM bookings b
@@ -401,181 +398,673 @@ class DatabaseManager:
             params.append(client_id)
         
         query += ' ORDER BY b.date, b.time'
-        
-        cursor.execute(query, params)
-        bookings = cursor.fetchall()
-        conn.close()
-        return [dict(b) for b in bookings]
+        return query, params
     
-    def get_booking(self, booking_id):
-        """Получить бронирование по ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT b.*, c.name as client_name, s.name as service_name, s.price
+    def get_bookings(self, date_from=None, date_to=None, status=None, client_id=None):
+        """Получить бронирования с фильтрами"""
+        query, params = self._bookings_query(date_from, date_to, status, client_id)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            bookings = cursor.fetchall()
+            return [dict(b) for b in bookings]
+    
+    def iter_bookings(self, date_from=None, date_to=None, status=None, client_id=None, batch_size=500):
+        """Бронирования по одному, без загрузки всего списка в память"""
+        query, params = self._bookings_query(date_from, date_to, status, client_id)
+        with self.connection() as conn:
+            cursor = conn.execute(query, params)
+            yield from _iter_rows(cursor, batch_size)
+    
+    def get_client_upcoming_bookings(self, client_id, from_date, limit=10):
+        """Подтвержденные записи клиента начиная с from_date (индекс client_id, date)"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT b.id, b.date, b.time, b.status, s.name as service_name, s.price,
+                       COALESCE(b.duration, s.duration) as duration
+                FROM bookings b
+                JOIN services s ON b.service_id = s.id
+                WHERE b.client_id = ? AND b.date >= ? AND b.status = 'confirmed'
+                ORDER BY b.date, b.time
+                LIMIT ?
+            ''', (client_id, from_date, limit))
+            return [dict(b) for b in cursor.fetchall()]
+    
+    def get_bookings_page(self, date_from=None, date_to=None, status=None, client_id=None,
+                          cursor=None, limit=100, fields=None):
+        """Страница бронирований с keyset-пагинацией по (date, time, id).
+        
+        Возвращает (список бронирований, курсор следующей страницы или None).
+        fields ограничивает набор возвращаемых полей (см. BOOKING_FIELDS).
+        """
+        if fields:
+            unknown = [f for f in fields if f not in BOOKING_FIELDS]
+            if unknown:
+                raise ValueError(f"Неизвестные поля: {', '.join(unknown)}")
+        selected = list(fields) if fields else list(BOOKING_FIELDS)
+        
+        # Ключ пагинации нужен всегда, даже если поля не запрошены
+        columns = [f'{BOOKING_FIELDS[f]} as {f}' for f in selected]
+        columns += [f'{BOOKING_FIELDS[k]} as _key_{k}' for k in ('date', 'time', 'id')]
+        
+        query = f'''
+            SELECT {', '.join(columns)}
             FROM bookings b
             JOIN clients c ON b.client_id = c.id
             JOIN services s ON b.service_id = s.id
-            WHERE b.id = ?
-        ''', (booking_id,))
-        booking = cursor.fetchone()
-        conn.close()
-        return dict(booking) if booking else None
+            WHERE 1=1
+        '''
+        params = []
+        
+        if date_from:
+            query += ' AND b.date >= ?'
+            params.append(date_from)
+        if date_to:
+            query += ' AND b.date <= ?'
+            params.append(date_to)
+        if status:
+            query += ' AND b.status = ?'
+            params.append(status)
+        if client_id:
+            query += ' AND b.client_id = ?'
+            params.append(client_id)
+        if cursor:
+            query += ' AND (b.date, b.time, b.id) > (?, ?, ?)'
+            params.extend(decode_cursor(cursor))
+        
+        query += ' ORDER BY b.date, b.time, b.id LIMIT ?'
+        params.append(limit + 1)
+        
+        with self.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last['_key_date'], last['_key_time'], last['_key_id'])
+        
+        return [{f: row[f] for f in selected} for row in rows], next_cursor
+    
+    def get_booking(self, booking_id):
+        """Получить бронирование по ID"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT b.*, c.name as client_name, s.name as service_name, s.price
+                FROM bookings b
+                JOIN clients c ON b.client_id = c.id
+                JOIN services s ON b.service_id = s.id
+                WHERE b.id = ?
+            ''', (booking_id,))
+            booking = cursor.fetchone()
+            return dict(booking) if booking else None
     
     def add_booking(self, data):
         """Добавить бронирование"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO bookings (client_id, service_id, date, time, duration, status, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            data['client_id'],
-            data['service_id'],
-            data['date'],
-            data['time'],
-            data.get('duration'),
-            data.get('status', 'confirmed'),
-            data.get('notes', '')
-        ))
-        conn.commit()
-        booking_id = cursor.lastrowid
-        conn.close()
-        return booking_id
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO bookings (client_id, service_id, date, time, duration, status, notes)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                data['client_id'],
+                data['service_id'],
+                data['date'],
+                data['time'],
+                data.get('duration'),
+                data.get('status', 'confirmed'),
+                data.get('notes', '')
+            ))
+            conn.commit()
+            booking_id = cursor.lastrowid
+            return booking_id
+    
+    def reserve_booking(self, data):
+        """Добавить бронирование, только если время свободно.
+        
+        Проверка пересечения и вставка выполняются в одной транзакции
+        BEGIN IMMEDIATE, поэтому одновременные записи из бота и веб-интерфейса
+        (в том числе из разных процессов) не могут занять одно время дважды.
+        Возвращает ID бронирования или None, если время занято.
+        """
+        with self._reserve_lock, self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                duration = self._booking_duration(conn, data)
+                if self._slot_taken(conn, data['date'], data['time'], duration):
+                    conn.rollback()
+                    return None
+                
+                cursor = conn.execute('''
+                    INSERT INTO bookings (client_id, service_id, date, time, duration, status, notes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    data['client_id'],
+                    data['service_id'],
+                    data['date'],
+                    data['time'],
+                    duration,
+                    data.get('status', 'confirmed'),
+                    data.get('notes', '')
+                ))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        
+        return cursor.lastrowid
+    
+    def _booking_duration(self, conn, booking):
+        """Длительность записи: своя или длительность услуги"""
+        duration = booking.get('duration')
+        if not duration:
+            row = conn.execute('SELECT duration FROM services WHERE id = ?',
+                               (booking['service_id'],)).fetchone()
+            duration = (row['duration'] if row else None) or DEFAULT_DURATION
+        return duration
+    
+    def _slot_taken(self, conn, date, time, duration, exclude_id=None):
+        """Пересекается ли интервал с активными записями дня (внутри транзакции)"""
+        busy = conn.execute('''
+            SELECT b.time, COALESCE(b.duration, s.duration) as duration
+            FROM bookings b
+            LEFT JOIN services s ON b.service_id = s.id
+            WHERE b.date = ? AND b.status NOT IN (?, ?) AND b.id != ?
+        ''', (date, *CANCELLED_STATUSES, exclude_id or 0)).fetchall()
+        
+        start = to_minutes(time)
+        return BusyIntervals.from_bookings([dict(b) for b in busy]).overlaps(start, start + duration)
     
     def update_booking(self, booking_id, data):
-        """Обновить бронирование"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        """Обновить бронирование.
         
+        Если активная запись переносится (меняются услуга, дата, время или
+        длительность) или отмененная запись снова становится активной,
+        пересечение с другими записями проверяется в той же транзакции, что и
+        обновление, как в reserve_booking. Смена одного статуса у активной
+        записи (например, на completed) время не занимает заново и не
+        проверяется. Возвращает False, если новое время занято.
+        
+        При переносе даты или времени и при возврате отмененной записи
+        reminder_sent сбрасывается, чтобы клиент получил напоминание о новом
+        времени (если reminder_sent не передан явно).
+        """
         fields = []
         values = []
         for key in ['client_id', 'service_id', 'date', 'time', 'duration', 'status', 'notes', 'reminder_sent']:
             if key in data:
                 fields.append(f"{key} = ?")
                 values.append(data[key])
+        if not fields:
+            return True
+        
+        with self._reserve_lock, self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if any(key in data for key in SLOT_FIELDS + ('status',)):
+                    row = conn.execute('''
+                        SELECT service_id, date, time, duration, status FROM bookings WHERE id = ?
+                    ''', (booking_id,)).fetchone()
+                    if row:
+                        booking = dict(row)
+                        moved = any(key in data and str(data[key]) != str(booking[key])
+                                    for key in SLOT_FIELDS)
+                        reactivated = (booking['status'] in CANCELLED_STATUSES
+                                       and data.get('status', booking['status']) not in CANCELLED_STATUSES)
+                        booking.update((key, data[key]) for key in SLOT_FIELDS + ('status',) if key in data)
+                        if ((moved or reactivated)
+                                and booking['status'] not in CANCELLED_STATUSES
+                                and self._slot_taken(
+                                    conn, booking['date'], booking['time'],
+                                    self._booking_duration(conn, booking), exclude_id=booking_id)):
+                            conn.rollback()
+                            return False
+                        
+                        rescheduled = any(key in data and str(data[key]) != str(row[key])
+                                          for key in ('date', 'time'))
+                        if (rescheduled or reactivated) and 'reminder_sent' not in data:
+                            fields.append("reminder_sent = ?")
+                            values.append(REMINDER_PENDING)
+                
+                conn.execute(f'''
+                    UPDATE bookings SET {', '.join(fields)} WHERE id = ?
+                ''', (*values, booking_id))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
         
-        values.append(booking_id)
-        cursor.execute(f'''
-            UPDATE bookings SET {', '.join(fields)} WHERE id = ?
-        ''', values)
-        conn.commit()
-        conn.close()
+        return True
     
     def delete_booking(self, booking_id):
         """Удалить бронирование"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM bookings WHERE id = ?', (booking_id,))
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM bookings WHERE id = ?', (booking_id,))
+            conn.commit()
     
     def get_bookings_for_date(self, date):
         """Получить бронирования на конкретную дату"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT b.*, c.name as client_name, s.name as service_name, s.duration
-            FROM bookings b
-            JOIN clients c ON b.client_id = c.id
-            JOIN services s ON b.service_id = s.id
-            WHERE b.date = ? AND b.status != 'cancelled'
-            ORDER BY b.time
-        ''', (date,))
-        bookings = cursor.fetchall()
-        conn.close()
-    
-        result = []
-        for b in bookings:
-            booking_dict = dict(b)
-            # Преобразуем время в строку, если нужно
-            if booking_dict.get('time'):
-                booking_dict['time'] = str(booking_dict['time'])
-            result.append(booking_dict)
-        
-        return result
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT b.*, c.name as client_name, s.name as service_name, s.duration
+                FROM bookings b
+                JOIN clients c ON b.client_id = c.id
+                JOIN services s ON b.service_id = s.id
+                WHERE b.date = ? AND b.status != 'cancelled'
+                ORDER BY b.time
+            ''', (date,))
+            bookings = cursor.fetchall()
+    
+            result = []
+            for b in bookings:
+                booking_dict = dict(b)
+                # Преобразуем время в строку, если нужно
+                if booking_dict.get('time'):
+                    booking_dict['time'] = str(booking_dict['time'])
+                result.append(booking_dict)
+            
+            return result
+    
+    def get_agenda(self, date_from, date_to=None):
+        """Расписание мастера на дату или диапазон дат одним запросом: запись, клиент, услуга"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT b.id, b.date, b.time, COALESCE(b.duration, s.duration) as duration,
+                       b.status, b.notes,
+                       c.name as client_name, c.phone as client_phone,
+                       s.name as service_name, s.price
+                FROM bookings b
+                JOIN clients c ON b.client_id = c.id
+                JOIN services s ON b.service_id = s.id
+                WHERE b.date >= ? AND b.date <= ? AND b.status NOT IN (?, ?)
+                ORDER BY b.date, b.time
+            ''', (date_from, date_to or date_from, *CANCELLED_STATUSES))
+            return [dict(b) for b in cursor.fetchall()]
+    
+    def get_busy_bookings(self, date_from, date_to=None):
+        """Бронирования, занимающие время в дату (или диапазон дат) — для расчета доступности"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT b.id, b.date, b.time, COALESCE(b.duration, s.duration) as duration,
+                       b.status, c.name as client_name, s.name as service_name
+                FROM bookings b
+                JOIN clients c ON b.client_id = c.id
+                JOIN services s ON b.service_id = s.id
+                WHERE b.date >= ? AND b.date <= ? AND b.status NOT IN (?, ?)
+                ORDER BY b.date, b.time
+            ''', (date_from, date_to or date_from, *CANCELLED_STATUSES))
+            return [dict(b) for b in cursor.fetchall()]
     
     def get_upcoming_bookings(self, days=7):
         """Получить предстоящие бронирования"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT b.*, c.name as client_name, c.telegram_id, s.name as service_name
-            FROM bookings b
-            JOIN clients c ON b.client_id = c.id
-            JOIN services s ON b.service_id = s.id
-            WHERE b.date >= date('now') 
-              AND b.date <= date('now', ?)
-              AND b.status = 'confirmed'
-              AND b.reminder_sent = 0
-            ORDER BY b.date, b.time
-        ''', (f'+{days} days',))
-        bookings = cursor.fetchall()
-        conn.close()
-        return [dict(b) for b in bookings]
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT b.*, c.name as client_name, c.telegram_id, s.name as service_name
+                FROM bookings b
+                JOIN clients c ON b.client_id = c.id
+                JOIN services s ON b.service_id = s.id
+                WHERE b.date >= date('now') 
+                  AND b.date <= date('now', ?)
+                  AND b.status = 'confirmed'
+                  AND b.reminder_sent = 0
+                ORDER BY b.date, b.time
+            ''', (f'+{days} days',))
+            bookings = cursor.fetchall()
+            return [dict(b) for b in bookings]
+    
+    def get_due_reminders(self, now, lead_hours=24, limit=100):
+        """Подтвержденные записи без напоминания, до начала которых осталось не больше lead_hours.
+        
+        Использует частичный индекс idx_bookings_reminder_due.
+        """
+        until = now + timedelta(hours=lead_hours)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT b.id, b.date, b.time, b.client_id,
+                       c.name as client_name, c.telegram_id, c.telegram_notifications,
+                       s.name as service_name
+                FROM bookings b
+                JOIN clients c ON b.client_id = c.id
+                JOIN services s ON b.service_id = s.id
+                WHERE b.status = 'confirmed'
+                  AND b.reminder_sent = 0
+                  AND (b.date, b.time) > (?, ?)
+                  AND (b.date, b.time) <= (?, ?)
+                ORDER BY b.date, b.time
+                LIMIT ?
+            ''', (
+                now.strftime('%Y-%m-%d'), now.strftime('%H:%M'),
+                until.strftime('%Y-%m-%d'), until.strftime('%H:%M'),
+                limit
+            ))
+            return [dict(b) for b in cursor.fetchall()]
+    
+    def mark_reminders(self, booking_ids, value=REMINDER_SENT):
+        """Отметить напоминания одним UPDATE"""
+        if not booking_ids:
+            return 0
+        with self.connection() as conn:
+            placeholders = ', '.join('?' for _ in booking_ids)
+            cursor = conn.execute(
+                f'UPDATE bookings SET reminder_sent = ? WHERE id IN ({placeholders})',
+                (value, *booking_ids)
+            )
+            conn.commit()
+            return cursor.rowcount
+    
+    # ========== ИСХОДЯЩИЕ СООБЩЕНИЯ ==========
+    
+    def save_outbox(self, messages):
+        """Сохранить недоставленные сообщения бота"""
+        if not messages:
+            return
+        with self.connection() as conn:
+            conn.executemany('''
+                INSERT INTO outbox (chat_id, text, parse_mode, attempts, last_error)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [
+                (m['chat_id'], m['text'], m.get('parse_mode'), m.get('attempts', 0), m.get('last_error'))
+                for m in messages
+            ])
+            conn.commit()
+    
+    def take_outbox(self):
+        """Забрать (прочитать и удалить) все сохраненные сообщения бота"""
+        with self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = conn.execute('SELECT * FROM outbox ORDER BY id').fetchall()
+                conn.execute('DELETE FROM outbox')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            return [dict(r) for r in rows]
+    
+    # ========== СОСТОЯНИЕ БОТА ==========
+    
+    def load_bot_state(self, kind):
+        """Сохраненные данные бота вида kind ('user' или 'chat'): список (ключ, JSON)"""
+        with self.connection() as conn:
+            rows = conn.execute(
+                'SELECT key, data FROM bot_state WHERE kind = ?', (kind,)
+            ).fetchall()
+            return [(r['key'], r['data']) for r in rows]
+    
+    def save_bot_state(self, items):
+        """Записать изменения состояния бота одной транзакцией.
+        
+        items — список (kind, key, JSON); JSON None удаляет запись.
+        """
+        now = time.time()
+        updates = [(kind, key, data, now) for kind, key, data in items if data is not None]
+        deletes = [(kind, key) for kind, key, data in items if data is None]
+        with self.connection() as conn:
+            if updates:
+                conn.executemany('''
+                    INSERT INTO bot_state (kind, key, data, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(kind, key) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at
+                ''', updates)
+            if deletes:
+                conn.executemany('DELETE FROM bot_state WHERE kind = ? AND key = ?', deletes)
+            conn.commit()
+    
+    def sweep_bot_state(self, ttl):
+        """Удалить состояние бота, не менявшееся дольше ttl секунд"""
+        with self.connection() as conn:
+            cursor = conn.execute('DELETE FROM bot_state WHERE updated_at < ?', (time.time() - ttl,))
+            conn.commit()
+            return cursor.rowcount
     
     # ========== СТАТИСТИКА ==========
     
     def get_stats(self):
-        """Получить статистику"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        """Получить статистику.
+
+        Читает счетчики stats_counters, которые триггеры обновляют при каждой
+        записи, поэтому время ответа не зависит от размера таблиц.
+        """
+        month = 'month:' + datetime.now().strftime('%Y-%m')
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT key, value FROM stats_counters
+                WHERE key IN ('clients', 'services_active', 'bookings',
+                              'status:completed', 'status:cancelled')
+            ''')
+            counters = dict(cursor.fetchall())
+            
+            # Записи с начала текущего месяца, включая будущие месяцы
+            cursor.execute('''
+                SELECT COALESCE(SUM(value), 0) FROM stats_counters
+                WHERE key >= ? AND key < 'month;'
+            ''', (month,))
+            month_bookings = cursor.fetchone()[0]
+            
+            # Популярные услуги
+            cursor.execute('''
+                SELECT s.name, c.value
+                FROM stats_counters c
+                JOIN services s ON s.id = CAST(substr(c.key, 9) AS INTEGER)
+                WHERE c.key >= 'service:' AND c.key < 'service;' AND c.value > 0
+                ORDER BY c.value DESC
+                LIMIT 5
+            ''')
+            popular = cursor.fetchall()
+            
+            return {
+                'total_clients': counters.get('clients', 0),
+                'total_services': counters.get('services_active', 0),
+                'total_bookings': counters.get('bookings', 0),
+                'completed_bookings': counters.get('status:completed', 0),
+                'cancelled_bookings': counters.get('status:cancelled', 0),
+                'month_bookings': month_bookings,
+                'popular_services': [{'name': p[0], 'count': p[1]} for p in popular]
+            }
+
+    def get_bot_stats(self):
+        """Клиенты и записи через Telegram-бота (из счетчиков stats_counters)"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT key, value FROM stats_counters
+                WHERE key IN ('clients:telegram', 'clients:subscribed', 'bookings:telegram')
+            ''')
+            counters = dict(cursor.fetchall())
+            return {
+                'total_telegram_clients': counters.get('clients:telegram', 0),
+                'telegram_bookings': counters.get('bookings:telegram', 0),
+                'active_subscribers': counters.get('clients:subscribed', 0)
+            }
+    
+    def get_daily_stats(self, date_from, date_to):
+        """Дневные сводки за диапазон дат (только дни, в которые были записи)"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT date, bookings, cancelled, revenue, booked_minutes
+                FROM daily_stats
+                WHERE date BETWEEN ? AND ?
+                ORDER BY date
+            ''', (date_from, date_to))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def rebuild_stats(self):
+        """Пересчитать счетчики и дневные сводки по таблицам. Возвращает расхождения"""
+        with self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                diff = rebuild_stats(conn)
+                diff.update(rebuild_daily_stats(conn))
+                if diff:
+                    bump_versions(conn, 'stats')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        if diff:
+            print(f"⚠️ Исправлено расхождений статистики: {len(diff)}")
+        return diff
+    
+    # ========== ДЛЯ БОТА ==========
+    
+    def get_clients_for_notifications(self):
+        """Получить клиентов для уведомлений"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM clients 
+                WHERE telegram_id IS NOT NULL 
+                  AND telegram_notifications = 1
+            ''')
+            clients = cursor.fetchall()
+            return [dict(c) for c in clients]
+
+
+def encode_cursor(date, time, booking_id):
+    """Курсор пагинации бронирований"""
+    raw = f'{date}|{time}|{booking_id}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Разбор курсора пагинации. Возвращает (date, time, id)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        date, time, booking_id = raw.split('|')
+        return date, time, int(booking_id)
+    except (ValueError, UnicodeError):
+        raise ValueError('Неверный курсор')
+
+
+class DatabaseRegistry:
+    """Реестр менеджеров баз данных мастеров (один экземпляр на процесс)"""
+    
+    def __init__(self, idle_timeout=1800, sweep_interval=60, pool_size=5, pragmas=None):
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self.pool_size = pool_size
+        self.pragmas = pragmas
+        self._managers = {}
+        self._last_used = {}
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+        self._maintenance_thread = None
+        self._maintenance_stop = threading.Event()
+    
+    def get(self, master_id):
+        """Получить (или создать) менеджер базы для мастера"""
+        key = str(master_id)
+        now = time.monotonic()
+        
+        with self._lock:
+            db = self._managers.get(key)
+            self._last_used[key] = now
         
-        cursor.execute('SELECT COUNT(*) FROM clients')
-        total_clients = cursor.fetchone()[0]
+        if db is None:
+            # Создание вне общей блокировки: инициализация схемы может быть долгой
+            created = DatabaseManager(master_id, pool_size=self.pool_size, pragmas=self.pragmas)
+            with self._lock:
+                db = self._managers.setdefault(key, created)
+            if db is not created:
+                created.close()
         
-        cursor.execute('SELECT COUNT(*) FROM services WHERE is_active = 1')
-        total_services = cursor.fetchone()[0]
+        if now - self._last_sweep >= self.sweep_interval:
+            self.evict_idle()
         
-        cursor.execute('SELECT COUNT(*) FROM bookings')
-        total_bookings = cursor.fetchone()[0]
+        return db
+    
+    def evict_idle(self):
+        """Удалить менеджеры мастеров, к которым давно не обращались.
         
-        cursor.execute('SELECT COUNT(*) FROM bookings WHERE status = "completed"')
-        completed_bookings = cursor.fetchone()[0]
+        Менеджер, соединения которого еще заняты (потоковая выдача, запрос
+        или обработчик бота), не закрывается и остается в реестре до
+        следующего прохода: иначе его владелец продолжил бы работать через
+        закрытый пул, открывая новое соединение на каждый вызов.
+        """
+        now = time.monotonic()
+        evicted = 0
+        with self._lock:
+            self._last_sweep = now
+            idle = [key for key, used in self._last_used.items()
+                    if now - used >= self.idle_timeout]
+            for key in idle:
+                db = self._managers.get(key)
+                # Проверка и закрытие под блокировкой реестра: get() не выдаст
+                # этот менеджер в промежутке
+                if db is not None and not db.pool.close_if_unused():
+                    continue
+                self._last_used.pop(key, None)
+                if self._managers.pop(key, None) is not None:
+                    evicted += 1
+        return evicted
+    
+    def remove(self, master_id):
+        """Удалить менеджер мастера из реестра"""
+        key = str(master_id)
+        with self._lock:
+            self._last_used.pop(key, None)
+            db = self._managers.pop(key, None)
         
-        cursor.execute('SELECT COUNT(*) FROM bookings WHERE status = "cancelled"')
-        cancelled_bookings = cursor.fetchone()[0]
+        if db is None:
+            return False
+        db.close()
+        return True
+    
+    def clear(self):
+        """Очистить реестр"""
+        with self._lock:
+            managers = list(self._managers.values())
+            self._managers.clear()
+            self._last_used.clear()
         
-        cursor.execute('''
-            SELECT COUNT(*) FROM bookings 
-            WHERE date >= date('now', 'start of month')
-        ''')
-        month_bookings = cursor.fetchone()[0]
+        for db in managers:
+            db.close()
+    
+    def checkpoint_all(self, mode='PASSIVE'):
+        """Выполнить WAL checkpoint для всех открытых баз"""
+        with self._lock:
+            managers = list(self._managers.values())
         
-        # Популярные услуги
-        cursor.execute('''
-            SELECT s.name, COUNT(b.id) as count
-            FROM bookings b
-            JOIN services s ON b.service_id = s.id
-            GROUP BY s.id
-            ORDER BY count DESC
-            LIMIT 5
-        ''')
-        popular = cursor.fetchall()
-        
-        conn.close()
-        
-        return {
-            'total_clients': total_clients,
-            'total_services': total_services,
-            'total_bookings': total_bookings,
-            'completed_bookings': completed_bookings,
-            'cancelled_bookings': cancelled_bookings,
-            'month_bookings': month_bookings,
-            'popular_services': [{'name': p[0], 'count': p[1]} for p in popular]
-        }
+        for db in managers:
+            try:
+                db.checkpoint(mode)
+            except sqlite3.Error as e:
+                print(f"❌ Ошибка checkpoint для мастера {db.master_id}: {e}")
     
-    # ========== ДЛЯ БОТА ==========
+    def start_maintenance(self, interval=300):
+        """Запустить фоновое обслуживание: checkpoint и вытеснение простаивающих баз"""
+        if self._maintenance_thread and self._maintenance_thread.is_alive():
+            return
+        
+        self._maintenance_stop.clear()
+        
+        def run():
+            while not self._maintenance_stop.wait(interval):
+                self.checkpoint_all()
+                self.evict_idle()
+        
+        self._maintenance_thread = threading.Thread(target=run, daemon=True)
+        self._maintenance_thread.start()
     
-    def get_clients_for_notifications(self):
-        """Получить клиентов для уведомлений"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM clients 
-            WHERE telegram_id IS NOT NULL 
-              AND telegram_notifications = 1
-        ''')
-        clients = cursor.fetchall()
-        conn.close()
-        return [dict(c) for c in clients]
\ No newline at end of file
+    def stop_maintenance(self):
+        """Остановить фоновое обслуживание"""
+        self._maintenance_stop.set()
+
+
+# Общий реестр процесса
+registry = DatabaseRegistry()
+
+
+def get_database(master_id):
+    """Получить менеджер базы данных мастера из общего реестра"""
+    return registry.get(master_id)
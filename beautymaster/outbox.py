@@ -0,0 +1,224 @@
+import asyncio
+import logging
+
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+from .ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Лимит Telegram для одного чата — около одного сообщения в секунду
+PER_CHAT_RATE = 1
+PER_CHAT_BURST = 3
+# Сколько ждать попутных сообщений перед отправкой, секунды
+COALESCE_DELAY = 0.5
+# Повторные попытки: экспоненциальная задержка, не больше MAX_BACKOFF секунд
+MAX_ATTEMPTS = 5
+BASE_BACKOFF = 2
+MAX_BACKOFF = 60
+# Максимальная длина сообщения Telegram
+MESSAGE_LIMIT = 4096
+DIGEST_SEPARATOR = '\n\n〰〰〰〰〰〰〰〰〰〰\n\n'
+
+
+def digest(messages: list[dict]) -> list[tuple[str, list[dict]]]:
+    """Склеить несколько сообщений одного чата в сводки не длиннее лимита Telegram.
+
+    Возвращает пары (текст сводки, вошедшие в нее сообщения).
+    """
+    if len(messages) == 1:
+        return [(messages[0]['text'], messages)]
+
+    header = f"📬 **Уведомления ({len(messages)})**\n\n"
+    parts = []
+    current, included = header, []
+    for message in messages:
+        text = message['text']
+        chunk = text if current == header else DIGEST_SEPARATOR + text
+        if len(current) + len(chunk) > MESSAGE_LIMIT and current != header:
+            parts.append((current, included))
+            current, included = header + text, [message]
+        else:
+            current += chunk
+            included.append(message)
+    parts.append((current, included))
+    return parts
+
+
+class Outbox:
+    """Очередь исходящих сообщений одного бота.
+
+    Обработчики вызывают enqueue() и сразу продолжают работу; отправку
+    выполняет отдельная задача на каждый чат в event loop бота. Частота
+    ограничивается корзиной токенов чата и общей корзиной бота, сообщения,
+    накопившиеся за время ожидания, отправляются одной сводкой. Недоставленные
+    после всех попыток или при остановке бота сообщения сохраняются в базе
+    мастера и отправляются при следующем запуске.
+    """
+
+    def __init__(self, bot, global_limiter: TokenBucket):
+        self.bot = bot
+        self.global_limiter = global_limiter
+        self.pending: dict[str, list[dict]] = {}
+        self.chat_limiters: dict[str, TokenBucket] = {}
+        self.workers: dict[str, asyncio.Task] = {}
+        self.counters = {'sent': 0, 'coalesced': 0, 'retried': 0, 'failed': 0}
+        # Сообщений в очереди; читается из других потоков вместо обхода pending
+        self.queued = 0
+
+    def enqueue(self, chat_id, text: str, parse_mode: str | None = 'Markdown'):
+        """Поставить сообщение в очередь (вызывается из event loop бота)"""
+        self._push(str(chat_id), [{'chat_id': str(chat_id), 'text': text,
+                                   'parse_mode': parse_mode, 'attempts': 0}])
+
+    def _push(self, chat_id: str, messages: list[dict]):
+        self.pending.setdefault(chat_id, []).extend(messages)
+        self.queued += len(messages)
+        if chat_id not in self.workers:
+            self.workers[chat_id] = asyncio.create_task(self._chat_worker(chat_id))
+
+    async def restore(self):
+        """Поставить в очередь сообщения, сохраненные при прошлой остановке"""
+        messages = await self.bot._db().take_outbox()
+        for message in messages:
+            self._push(message['chat_id'], [message])
+        if messages:
+            print(f"📬 [МАСТЕР {self.bot.master_id}] Восстановлено сообщений: {len(messages)}")
+
+    async def close(self):
+        """Остановить отправку и сохранить неотправленное в базу"""
+        workers, self.workers = list(self.workers.values()), {}
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+        messages = [m for queue in self.pending.values() for m in queue]
+        self.pending.clear()
+        self.queued = 0
+        if messages:
+            await self.bot._db().save_outbox(messages)
+            print(f"📬 [МАСТЕР {self.bot.master_id}] Сохранено неотправленных сообщений: {len(messages)}")
+
+    async def _chat_worker(self, chat_id: str):
+        limiter = self.chat_limiters.setdefault(chat_id, TokenBucket(PER_CHAT_RATE, PER_CHAT_BURST))
+        try:
+            while self.pending.get(chat_id):
+                await asyncio.sleep(COALESCE_DELAY)
+                await limiter.acquire()
+                # Берем все, что накопилось за время ожидания
+                batch = self.pending.pop(chat_id, [])
+                self.queued -= len(batch)
+                if not batch:
+                    continue
+                try:
+                    delay = await self._send(chat_id, batch)
+                except asyncio.CancelledError:
+                    self._push_back(chat_id, batch)
+                    raise
+                if delay:
+                    await asyncio.sleep(delay)
+        finally:
+            if self.workers.get(chat_id) is asyncio.current_task():
+                del self.workers[chat_id]
+
+    def _push_back(self, chat_id: str, batch: list[dict]):
+        """Вернуть пачку в начало очереди чата, не запуская новый обработчик"""
+        self.pending[chat_id] = batch + self.pending.get(chat_id, [])
+        self.queued += len(batch)
+
+    async def _send(self, chat_id: str, batch: list[dict]) -> float:
+        """Отправить пачку. Возвращает паузу перед следующей попыткой, секунды"""
+        application = self.bot.application
+        if not application:
+            self._push_back(chat_id, batch)
+            return BASE_BACKOFF
+
+        parse_mode = batch[0].get('parse_mode')
+        if any(m.get('parse_mode') != parse_mode for m in batch):
+            parse_mode = None
+        parts = digest(batch)
+
+        for index, (text, messages) in enumerate(parts):
+            # Сообщения этой и следующих сводок, еще не отправленные
+            rest = [m for _, part in parts[index:] for m in part]
+            try:
+                await self.global_limiter.acquire()
+                await application.bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+            except RetryAfter as e:
+                self.counters['retried'] += 1
+                self._push_back(chat_id, rest)
+                return e.retry_after
+            except Forbidden as e:
+                # Бот заблокирован в чате: повтор не поможет
+                self.counters['failed'] += len(rest)
+                logger.error(f"Сообщение в чат {chat_id} бота {self.bot.master_id} отброшено: {e}")
+                return 0
+            except BadRequest as e:
+                # Обычно разметку ломает текст пользователя — отправляем сводку
+                # по одному сообщению без разметки
+                logger.warning(f"Сводка в чат {chat_id} бота {self.bot.master_id} отклонена, "
+                               f"отправка без разметки: {e}")
+                unsent, delay = await self._send_plain(chat_id, messages)
+                if delay:
+                    self._push_back(chat_id, unsent + [m for _, part in parts[index + 1:] for m in part])
+                    return delay
+                continue
+            except TelegramError as e:
+                return await self._retry(chat_id, rest, e)
+
+            self.counters['sent'] += 1
+            self.counters['coalesced'] += len(messages) - 1
+        return 0
+
+    async def _send_plain(self, chat_id: str, messages: list[dict]) -> tuple[list[dict], float]:
+        """Отправить сообщения по одному без разметки.
+
+        Не принятые Telegram сообщения сохраняются в базе, как после
+        исчерпания попыток. При RetryAfter возвращает еще не отправленные
+        сообщения и паузу в секундах.
+        """
+        application = self.bot.application
+        failed = []
+        for index, message in enumerate(messages):
+            message['parse_mode'] = None
+            try:
+                await self.global_limiter.acquire()
+                await application.bot.send_message(chat_id=chat_id, text=message['text'])
+            except RetryAfter as e:
+                self.counters['retried'] += 1
+                await self._save_failed(chat_id, failed)
+                return messages[index:], e.retry_after
+            except TelegramError as e:
+                message['attempts'] = message.get('attempts', 0) + 1
+                message['last_error'] = str(e)
+                failed.append(message)
+            else:
+                self.counters['sent'] += 1
+        await self._save_failed(chat_id, failed)
+        return [], 0
+
+    async def _save_failed(self, chat_id: str, messages: list[dict]):
+        if not messages:
+            return
+        self.counters['failed'] += len(messages)
+        await self.bot._db().save_outbox(messages)
+        logger.error(f"Сообщения в чат {chat_id} бота {self.bot.master_id} не доставлены: "
+                     f"{messages[-1]['last_error']}")
+
+    async def _retry(self, chat_id: str, batch: list[dict], error: Exception):
+        for message in batch:
+            message['attempts'] = message.get('attempts', 0) + 1
+            message['last_error'] = str(error)
+
+        retry = [m for m in batch if m['attempts'] < MAX_ATTEMPTS]
+        dead = [m for m in batch if m['attempts'] >= MAX_ATTEMPTS]
+        if dead:
+            # Попытки исчерпаны: оставляем в базе до следующего запуска бота
+            await self._save_failed(chat_id, dead)
+        if retry:
+            self.counters['retried'] += 1
+            attempts = max(m['attempts'] for m in retry)
+            delay = min(MAX_BACKOFF, BASE_BACKOFF ** attempts)
+            self._push_back(chat_id, retry)
+            return delay
+        return 0
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Callable
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from .async_db import AsyncDatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Как часто Application передает измененные данные в хранилище, секунды
+STATE_UPDATE_INTERVAL = 5
+# Незаконченные диалоги старше этого срока удаляются, секунды
+STATE_TTL = 7 * 24 * 3600
+# Как часто удалять устаревшие записи, секунды
+STATE_SWEEP_INTERVAL = 3600
+
+
+class SQLitePersistence(BasePersistence):
+    """Хранение user_data и chat_data бота в базе мастера (таблица bot_state).
+
+    Изменения, которые Application передает раз в update_interval, копятся в
+    памяти и записываются одной транзакцией; пустые словари удаляются, а не
+    хранятся. При загрузке и не чаще раза в STATE_SWEEP_INTERVAL удаляются
+    записи, не менявшиеся дольше STATE_TTL.
+
+    База запрашивается через get_db при каждом обращении: реестр может закрыть
+    простаивающий менеджер, пока бот продолжает работать.
+    """
+
+    def __init__(self, get_db: Callable[[], AsyncDatabaseManager],
+                 update_interval: float = STATE_UPDATE_INTERVAL, ttl: float = STATE_TTL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=True, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._db = get_db
+        self.ttl = ttl
+        # (тип, id) -> JSON или None для удаления
+        self._dirty: dict[tuple[str, str], str | None] = {}
+        self._write_task: asyncio.Task | None = None
+        self._last_sweep = 0.0
+
+    # ========== ЗАГРУЗКА ==========
+
+    async def _load(self, kind: str) -> dict:
+        if time.monotonic() - self._last_sweep > STATE_SWEEP_INTERVAL:
+            await self._sweep()
+        rows = await self._db().load_bot_state(kind)
+        data = {}
+        for key, value in rows:
+            try:
+                data[int(key)] = json.loads(value)
+            except ValueError:
+                logger.warning(f"Поврежденное состояние бота {kind}:{key} пропущено")
+        return data
+
+    async def get_user_data(self) -> dict:
+        return await self._load('user')
+
+    async def get_chat_data(self) -> dict:
+        return await self._load('chat')
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+
+    # ========== ЗАПИСЬ ==========
+
+    def _mark(self, kind: str, key, data):
+        self._dirty[(kind, str(key))] = json.dumps(data, ensure_ascii=False, default=str) if data else None
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._write_soon())
+
+    async def _write_soon(self):
+        # Даем Application передать все изменения текущего цикла
+        await asyncio.sleep(0)
+        await self.flush()
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._mark('user', user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        self._mark('chat', chat_id, data)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._mark('user', user_id, None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._mark('chat', chat_id, None)
+
+    async def update_bot_data(self, data) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """Записать накопленные изменения одной транзакцией"""
+        if not self._dirty:
+            return
+        batch, self._dirty = self._dirty, {}
+        items = [(kind, key, value) for (kind, key), value in batch.items()]
+        try:
+            await self._db().save_bot_state(items)
+        except Exception as e:
+            # Вернем изменения, не перезаписывая более свежие
+            for (kind, key), value in batch.items():
+                self._dirty.setdefault((kind, key), value)
+            logger.error(f"Ошибка сохранения состояния бота: {e}")
+
+        if time.monotonic() - self._last_sweep > STATE_SWEEP_INTERVAL:
+            await self._sweep()
+
+    async def _sweep(self):
+        self._last_sweep = time.monotonic()
+        try:
+            removed = await self._db().sweep_bot_state(self.ttl)
+        except Exception as e:
+            logger.error(f"Ошибка очистки состояния бота: {e}")
+            return
+        if removed:
+            logger.info(f"🧹 Удалено устаревших состояний бота: {removed}")
@@ -9,8 +9,11 @@ if root_dir not in sys.path:
 from plugin_base import Plugin
 from flask import jsonify, request, session, g
 from extensions import db
-from .models import DatabaseManager
+from .models import get_database, registry
 from .bot_manager import BotManager
+from .reminders import REMINDER_INTERVAL, REMINDER_LEAD_HOURS
+from .agenda import AGENDA_TIME
+from . import async_db
 
 # Импортируем маршруты
 from .routes.profile import register_profile_routes
@@ -18,6 +21,7 @@ from .routes.services import register_services_routes
 from .routes.clients import register_clients_routes
 from .routes.bookings import register_bookings_routes
 from .routes.schedule import register_schedule_routes
+from .routes.webhook import register_webhook_routes
 
 class BeautyMasterPlugin(Plugin):
     name = "Beauty Master Pro"
@@ -28,13 +32,24 @@ class BeautyMasterPlugin(Plugin):
     
     def __init__(self, app, db):
         super().__init__(app, db)
-        self.bot_manager = BotManager(self)
+        registry.pragmas = app.config.get('BEAUTYMASTER_SQLITE_PRAGMAS')
+        registry.start_maintenance(app.config.get('BEAUTYMASTER_CHECKPOINT_INTERVAL', 300))
+        async_db.configure(app.config.get('BEAUTYMASTER_BOT_DB_WORKERS', async_db.DEFAULT_MAX_WORKERS))
+        self.bot_manager = BotManager(
+            self,
+            loop_count=app.config.get('BEAUTYMASTER_BOT_LOOPS', 1),
+            webhook_url=app.config.get('BEAUTYMASTER_WEBHOOK_URL'),
+            api_base_url=app.config.get('BEAUTYMASTER_TELEGRAM_API_URL'),
+            reminder_interval=app.config.get('BEAUTYMASTER_REMINDER_INTERVAL', REMINDER_INTERVAL),
+            reminder_lead_hours=app.config.get('BEAUTYMASTER_REMINDER_LEAD_HOURS', REMINDER_LEAD_HOURS),
+            agenda_time=app.config.get('BEAUTYMASTER_AGENDA_TIME', AGENDA_TIME),
+        )
         self.setup_routes()
         print("✅ Beauty Master Pro инициализирован")
     
     def get_db_for_master(self, master_id):
         """Получить менеджер базы данных для мастера"""
-        return DatabaseManager(master_id)
+        return get_database(master_id)
     
     def get_current_master_db(self):
         """Получить базу данных для текущего пользователя"""
@@ -52,6 +67,7 @@ class BeautyMasterPlugin(Plugin):
         register_clients_routes(self.app, self)
         register_bookings_routes(self.app, self)
         register_schedule_routes(self.app, self)
+        register_webhook_routes(self.app, self)
     
     def get_widget(self):
         """Виджет для отображения"""
@@ -0,0 +1,159 @@
+import sqlite3
+import threading
+import time
+import asyncio
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """Пул переиспользуемых соединений SQLite для одного файла базы"""
+
+    def __init__(self, db_path, max_size=5, health_check_interval=30.0, on_connect=None):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self.on_connect = on_connect
+
+        # Свободные соединения: (соединение, время возврата в пул)
+        self._idle = []
+        self._lock = threading.Lock()
+        # Соединение, занятое текущим потоком / event loop
+        self._local = threading.local()
+        self._closed = False
+        # Сколько соединений сейчас выдано и еще не возвращено
+        self._borrowed = 0
+
+    def _owner_key(self):
+        """Ключ владельца соединения: поток и (если есть) запущенный event loop"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        return id(loop) if loop is not None else None
+
+    def _create(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        if self.on_connect:
+            self.on_connect(conn)
+        return conn
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """Взять соединение из пула (или создать новое)"""
+        with self._lock:
+            self._borrowed += 1
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    conn, released_at = self._idle.pop()
+
+                # Проверяем соединения, которые долго лежали без дела
+                if time.monotonic() - released_at < self.health_check_interval or self._is_healthy(conn):
+                    return conn
+                self._close(conn)
+
+            return self._create()
+        except Exception:
+            with self._lock:
+                self._borrowed -= 1
+            raise
+
+    def release(self, conn):
+        """Вернуть соединение в пул"""
+        with self._lock:
+            self._borrowed -= 1
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._close(conn)
+            return
+
+        with self._lock:
+            if not self._closed and len(self._idle) < self.max_size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        self._close(conn)
+
+    @contextmanager
+    def connection(self):
+        """Контекстный менеджер соединения.
+
+        Вложенные вызовы в том же потоке и event loop получают то же соединение.
+        """
+        held = getattr(self._local, 'held', None)
+        if held is None:
+            held = self._local.held = {}
+
+        key = self._owner_key()
+        entry = held.get(key)
+        if entry is not None:
+            entry[1] += 1
+            try:
+                yield entry[0]
+            finally:
+                entry[1] -= 1
+            return
+
+        conn = self.acquire()
+        held[key] = [conn, 1]
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            raise
+        finally:
+            held.pop(key, None)
+            self.release(conn)
+
+    def close_all(self):
+        """Закрыть все свободные соединения и запретить возврат новых"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def close_if_unused(self):
+        """Закрыть пул, только если ни одно соединение не выдано.
+
+        Возвращает False, если соединения еще заняты (например, потоковой
+        выдачей или незавершенным запросом) — тогда пул остается открытым.
+        """
+        with self._lock:
+            if self._borrowed:
+                return False
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+        return True
+
+    def in_use(self):
+        """Количество выданных и еще не возвращенных соединений"""
+        with self._lock:
+            return self._borrowed
+
+    def size(self):
+        """Количество свободных соединений в пуле"""
+        with self._lock:
+            return len(self._idle)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+from telegram.helpers import escape_markdown
+
+from .models import REMINDER_SENT, REMINDER_SKIPPED
+
+logger = logging.getLogger(__name__)
+
+# За сколько часов до визита отправлять напоминание
+REMINDER_LEAD_HOURS = 24
+# Период опроса баз, секунды
+REMINDER_INTERVAL = 60
+# Сколько напоминаний одного мастера обрабатывается за проход
+REMINDER_BATCH_SIZE = 100
+# Напоминание считается запоздавшим, если ушло позже срока больше чем на столько минут
+REMINDER_LAG_MINUTES = 10
+# После стольких неудачных попыток отправки напоминание больше не повторяется
+REMINDER_MAX_ATTEMPTS = 5
+
+
+def new_counters() -> dict:
+    return {
+        'sent': 0,
+        'failed': 0,
+        'skipped': 0,
+        'lagging': 0,
+        'last_run': None,
+    }
+
+
+def reminder_text(reminder: dict) -> str:
+    # Имена вводят клиенты и мастер: символы разметки в них ломают Markdown
+    client_name = escape_markdown(reminder['client_name'] or '', version=1)
+    service_name = escape_markdown(reminder['service_name'] or '', version=1)
+    return (
+        f"⏰ **Напоминание о записи**\n\n"
+        f"Здравствуйте, {client_name}!\n"
+        f"📅 {reminder['date']} в {reminder['time']}\n"
+        f"💇 {service_name}\n\n"
+        f"Ждём вас!"
+    )
+
+
+class ReminderScheduler:
+    """Периодическая рассылка напоминаний для ботов одного BotLoop.
+
+    Работает задачей в том же event loop, что и боты: за проход выбирает по
+    индексу подошедшие напоминания каждого запущенного бота, отправляет их с
+    ограничением частоты бота и отмечает отправку одним UPDATE.
+    """
+
+    def __init__(self, manager, bot_loop, interval: float = REMINDER_INTERVAL,
+                 lead_hours: int = REMINDER_LEAD_HOURS, batch_size: int = REMINDER_BATCH_SIZE):
+        self.manager = manager
+        self.bot_loop = bot_loop
+        self.interval = interval
+        self.lead_hours = lead_hours
+        self.batch_size = batch_size
+        self.task: asyncio.Task | None = None
+        # (мастер, id напоминания) -> число неудачных попыток отправки
+        self.attempts: dict[tuple, int] = {}
+
+    def start(self):
+        self.bot_loop.submit(self._run())
+
+    def stop(self, timeout: float = 5.0):
+        """Остановить рассылку (из любого потока, кроме потока event loop)"""
+        if not self.bot_loop.loop.is_running():
+            return
+        try:
+            self.bot_loop.submit(self._cancel()).result(timeout=timeout)
+        except Exception as e:
+            logger.error(f"Ошибка остановки напоминаний в {self.bot_loop.name}: {e}")
+
+    async def _cancel(self):
+        task, self.task = self.task, None
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self):
+        self.task = asyncio.current_task()
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Ошибка рассылки напоминаний в {self.bot_loop.name}: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self, now: datetime | None = None):
+        """Один проход по всем ботам этого loop"""
+        now = now or datetime.now()
+        bots = [self.manager.bots.get(master_id) for master_id in list(self.bot_loop.bots)]
+        bots = [bot for bot in bots if bot and bot.running]
+        if bots:
+            await asyncio.gather(*(self._process_bot(bot, now) for bot in bots))
+
+    async def _process_bot(self, bot, now: datetime):
+        counters = self.manager.reminder_counters(bot.master_id)
+        counters['last_run'] = now.isoformat(timespec='seconds')
+        db = bot._db()
+
+        reminders = await db.get_due_reminders(now, self.lead_hours, self.batch_size)
+        if not reminders:
+            return
+
+        # Счетчики попыток нужны только напоминаниям, которые еще ждут отправки
+        due = {(bot.master_id, r['id']) for r in reminders}
+        for key in [k for k in self.attempts if k[0] == bot.master_id and k not in due]:
+            del self.attempts[key]
+
+        deadline = now + timedelta(hours=self.lead_hours, minutes=-REMINDER_LAG_MINUTES)
+        sent, skipped, dropped = [], [], []
+        try:
+            for reminder in reminders:
+                application = bot.application
+                if not bot.running or not application:
+                    break
+
+                if not reminder.get('telegram_id') or not reminder.get('telegram_notifications'):
+                    skipped.append(reminder['id'])
+                    continue
+
+                await bot.rate_limiter.acquire()
+                try:
+                    await application.bot.send_message(
+                        chat_id=reminder['telegram_id'],
+                        text=reminder_text(reminder),
+                        parse_mode='Markdown'
+                    )
+                except Forbidden:
+                    # Клиент заблокировал бота
+                    skipped.append(reminder['id'])
+                    continue
+                except BadRequest as e:
+                    # Чат не найден, ошибка разметки и т.п.: повтор не поможет
+                    dropped.append(reminder['id'])
+                    logger.error(f"Напоминание {reminder['id']} мастера {bot.master_id} отброшено: {e}")
+                    continue
+                except RetryAfter as e:
+                    # Остаток партии уйдет в следующий проход
+                    counters['failed'] += 1
+                    logger.warning(f"Напоминания мастера {bot.master_id}: flood control {e.retry_after} c")
+                    break
+                except TelegramError as e:
+                    key = (bot.master_id, reminder['id'])
+                    attempts = self.attempts.get(key, 0) + 1
+                    if attempts >= REMINDER_MAX_ATTEMPTS:
+                        self.attempts.pop(key, None)
+                        dropped.append(reminder['id'])
+                    else:
+                        self.attempts[key] = attempts
+                        counters['failed'] += 1
+                    logger.error(f"Напоминание {reminder['id']} мастера {bot.master_id} не отправлено "
+                                 f"(попытка {attempts}): {e}")
+                    continue
+
+                self.attempts.pop((bot.master_id, reminder['id']), None)
+                sent.append(reminder['id'])
+                visit = datetime.strptime(f"{reminder['date']} {reminder['time'][:5]}", '%Y-%m-%d %H:%M')
+                if visit < deadline:
+                    counters['lagging'] += 1
+        finally:
+            if sent:
+                await db.mark_reminders(sent, REMINDER_SENT)
+            if skipped or dropped:
+                await db.mark_reminders(skipped + dropped, REMINDER_SKIPPED)
+            counters['sent'] += len(sent)
+            counters['skipped'] += len(skipped)
+            counters['failed'] += len(dropped)
+
+        if sent:
+            print(f"⏰ [МАСТЕР {bot.master_id}] Отправлено напоминаний: {len(sent)}")
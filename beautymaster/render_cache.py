@@ -0,0 +1,34 @@
+from datetime import datetime
+
+
+class RenderCache:
+    """Кэш готовых фрагментов ответов бота одного мастера (тексты, клавиатуры, данные).
+
+    Запись действительна, пока совпадает ее версия — обычно версии данных
+    DatabaseManager.stored_version(), к которым иногда добавляется дата, — и
+    не наступил срок expires.
+    """
+
+    def __init__(self):
+        self._entries: dict = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        """Значение из кэша или None, если записи нет или она устарела"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry_version, value, expires = entry
+            if entry_version == version and (expires is None or datetime.now() < expires):
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, key, version, value, expires: datetime | None = None):
+        """Сохранить значение; предыдущая версия записи вытесняется"""
+        self._entries[key] = (version, value, expires)
+        return value
+
+    def clear(self):
+        self._entries.clear()
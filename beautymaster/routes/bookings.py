@@ -1,10 +1,14 @@
 from flask import jsonify, request, session
 from datetime import datetime, timedelta
 import logging
+from .streaming import stream_rows, wants_stream
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
 def register_bookings_routes(app, plugin):
     
     @app.route('/api/plugins/beautymaster/bookings', methods=['GET', 'POST'])
@@ -25,6 +29,37 @@ def register_bookings_routes(app, plugin):
             status = request.args.get('status')
             client_id = request.args.get('client_id', type=int)
             
+            # Потоковая выдача: ?format=ndjson|stream
+            fmt = wants_stream(request)
+            if fmt:
+                return stream_rows(
+                    db.iter_bookings(
+                        date_from=date_from,
+                        date_to=date_to,
+                        status=status,
+                        client_id=client_id
+                    ),
+                    fmt
+                )
+            
+            # Постраничная выдача: ?limit=&cursor=&fields=
+            if any(arg in request.args for arg in ('limit', 'cursor', 'fields')):
+                limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+                fields = [f for f in request.args.get('fields', '').split(',') if f]
+                try:
+                    bookings, next_cursor = db.get_bookings_page(
+                        date_from=date_from,
+                        date_to=date_to,
+                        status=status,
+                        client_id=client_id,
+                        cursor=request.args.get('cursor'),
+                        limit=limit,
+                        fields=fields
+                    )
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+                return jsonify({'success': True, 'data': bookings, 'next_cursor': next_cursor})
+            
             bookings = db.get_bookings(
                 date_from=date_from,
                 date_to=date_to,
@@ -49,12 +84,11 @@ def register_bookings_routes(app, plugin):
             if not data or any(field not in data for field in required):
                 return jsonify({'error': 'Не все обязательные поля заполнены'}), 400
             
-            # Проверка доступности (ВРЕМЕННО ОТКЛЮЧАЕМ ДЛЯ ТЕСТА)
-            # if not check_availability(db, data['date'], data['time'], data.get('service_id')):
-            #     return jsonify({'error': 'Это время уже занято'}), 400
-            
             try:
-                booking_id = db.add_booking(data)
+                # Проверка доступности и вставка — одна транзакция
+                booking_id = db.reserve_booking(data)
+                if not booking_id:
+                    return jsonify({'error': 'Это время уже занято'}), 409
                 logger.info(f"✅ Бронирование создано, ID: {booking_id}")
                 
                 # Получаем созданное бронирование для ответа
@@ -71,7 +105,9 @@ def register_bookings_routes(app, plugin):
             if not booking:
                 return jsonify({'error': 'Бронирование не найдено'}), 404
             
-            db.update_booking(booking_id, request.json)
+            # Смена времени, услуги или статуса проверяется на пересечения
+            if not db.update_booking(booking_id, request.json or {}):
+                return jsonify({'error': 'Это время уже занято'}), 409
             return jsonify({'success': True})
         
         # DELETE удалить бронирование
@@ -82,69 +118,3 @@ def register_bookings_routes(app, plugin):
             
             db.delete_booking(booking_id)
             return jsonify({'success': True})
-
-def check_availability(db, date_str, time_str, service_id=None):
-    """Проверка доступности времени"""
-    try:
-        logger.info(f"🔍 Проверка доступности: {date_str} {time_str}")
-        
-        # Получаем бронирования на эту дату
-        bookings = db.get_bookings_for_date(date_str)
-        logger.info(f"Найдено бронирований: {len(bookings)}")
-        
-        # Если бронирований нет, сразу возвращаем True
-        if not bookings:
-            logger.info("✅ Свободно (нет бронирований)")
-            return True
-        
-        # Получаем длительность услуги
-        duration = 60
-        if service_id:
-            service = db.get_service(service_id)
-            if service:
-                duration = service.get('duration', 60)
-        
-        logger.info(f"Длительность услуги: {duration} мин")
-        
-        # Время новой записи
-        try:
-            new_datetime = datetime.strptime(f"{date_str} {time_str}", '%Y-%m-%d %H:%M')
-        except:
-            # Пробуем другой формат
-            new_datetime = datetime.strptime(f"{date_str} {time_str}", '%Y-%m-%d %H:%M')
-        
-        new_end = new_datetime + timedelta(minutes=duration)
-        
-        logger.info(f"Новая запись: {new_datetime} - {new_end}")
-        
-        # Проверяем каждое существующее бронирование
-        for booking in bookings:
-            try:
-                # Пропускаем отмененные бронирования
-                if booking.get('status') == 'cancelled':
-                    continue
-                
-                # Парсим время бронирования
-                booking_datetime = datetime.strptime(f"{booking['date']} {booking['time']}", '%Y-%m-%d %H:%M')
-                booking_duration = booking.get('duration', 60)
-                booking_end = booking_datetime + timedelta(minutes=booking_duration)
-                
-                logger.info(f"Проверка с бронированием {booking.get('id')}: {booking_datetime} - {booking_end}")
-                
-                # Проверяем пересечение
-                if (new_datetime < booking_end and new_end > booking_datetime):
-                    logger.info(f"❌ Конфликт с бронированием ID {booking.get('id')}")
-                    return False
-                    
-            except Exception as e:
-                logger.error(f"Ошибка при проверке бронирования {booking.get('id')}: {e}")
-                continue
-        
-        logger.info("✅ Время свободно")
-        return True
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка проверки доступности: {e}")
-        import traceback
-        traceback.print_exc()
-        return True  # В случае ошибки разрешаем запись
\ No newline at end of file
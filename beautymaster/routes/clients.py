@@ -1,4 +1,5 @@
 from flask import jsonify, request, session
+from .streaming import stream_rows, wants_stream
 
 def register_clients_routes(app, plugin):
     
@@ -14,6 +15,10 @@ def register_clients_routes(app, plugin):
             return jsonify({'error': 'База данных не найдена'}), 400
         
         if request.method == 'GET' and client_id is None:
+            fmt = wants_stream(request)
+            if fmt:
+                return stream_rows(db.iter_clients(), fmt)
+            
             clients = db.get_clients()
             return jsonify({'success': True, 'data': clients})
         
@@ -1,5 +1,7 @@
 from flask import jsonify, request, session
 
+from ..http_cache import cached_json
+
 def register_profile_routes(app, plugin):
     
     @app.route('/api/plugins/beautymaster/profile', methods=['GET', 'PUT'])
@@ -13,39 +15,32 @@ def register_profile_routes(app, plugin):
             return jsonify({'error': 'База данных не найдена'}), 400
         
         if request.method == 'GET':
-            profile = db.get_profile()
-            return jsonify({'success': True, 'data': profile})
+            return cached_json(db, ('profile',), lambda: {'success': True, 'data': db.get_profile()})
         
         elif request.method == 'PUT':
             data = request.json
             if data:
-                # Сохраняем старые значения для сравнения
-                old_profile = db.get_profile()
-                old_token = old_profile.get('telegram_bot_token') if old_profile else None
-                old_enabled = old_profile.get('telegram_notifications') if old_profile else False
-                
                 # Обновляем профиль
                 db.update_profile(data)
                 
                 # Получаем обновленный профиль
                 profile = db.get_profile()
                 
-                # Перезапускаем бота если изменились настройки
+                # Применяем настройки бота: перезапуск только при смене токена
                 new_token = profile.get('telegram_bot_token')
                 new_enabled = profile.get('telegram_notifications')
                 
-                if (new_token != old_token or new_enabled != old_enabled):
-                    master_id = session['user_id']
-                    if new_token and new_enabled:
-                        plugin.bot_manager.restart_bot(
-                            master_id,
-                            new_token,
-                            profile.get('telegram_admin_id')
-                        )
-                        print(f"✅ Бот перезапущен для мастера {master_id}")
-                    else:
-                        plugin.bot_manager.stop_bot(master_id)
-                        print(f"⏹ Бот остановлен для мастера {master_id}")
+                master_id = session['user_id']
+                bot = plugin.bot_manager.apply_config(
+                    master_id,
+                    new_token,
+                    profile.get('telegram_admin_id'),
+                    enabled=bool(new_enabled)
+                )
+                if bot['action'] != 'unchanged':
+                    print(f"🔄 Бот мастера {master_id}: {bot['action']}")
+                
+                return jsonify({'success': True, 'data': profile, 'bot': bot})
             
             return jsonify({'success': True, 'data': profile})
     
@@ -114,13 +109,13 @@ def register_profile_routes(app, plugin):
         
         profile = db.get_profile()
         master_id = session['user_id']
-        
+
         return jsonify({
             'success': True,
             'data': {
                 'configured': bool(profile.get('telegram_bot_token')),
                 'enabled': profile.get('telegram_notifications', False),
-                'running': master_id in plugin.bot_manager.bots,
+                **plugin.bot_manager.status(master_id),
                 'admin_id': profile.get('telegram_admin_id')
             }
         })
@@ -147,10 +142,12 @@ def register_profile_routes(app, plugin):
                 profile.get('telegram_bot_token'),
                 profile.get('telegram_admin_id')
             )
-            return jsonify({'success': True, 'message': 'Бот перезапущен'})
+            message = 'Бот перезапускается'
         else:
-            plugin.bot_manager.stop_bot(master_id)
-            return jsonify({'success': True, 'message': 'Бот остановлен'})
+            plugin.bot_manager.stop_bot(master_id, wait=False)
+            message = 'Бот останавливается'
+        
+        return jsonify({'success': True, 'message': message, 'data': plugin.bot_manager.status(master_id)})
     
     @app.route('/api/plugins/beautymaster/bot-stats', methods=['GET'])
     def bot_stats():
@@ -162,22 +159,18 @@ def register_profile_routes(app, plugin):
         if not db:
             return jsonify({'error': 'База данных не найдена'}), 400
         
-        clients = db.get_clients()
-        telegram_clients = [c for c in clients if c.get('telegram_id')]
-        
-        bookings = db.get_bookings()
-        telegram_bookings = [b for b in bookings if b.get('client_telegram')]
-        
-        active_subscribers = [c for c in telegram_clients if c.get('telegram_notifications')]
+        stats = db.get_bot_stats()
         
         master_id = session['user_id']
+        bot = plugin.bot_manager.bots.get(master_id)
+        outbox = bot.outbox if bot else None
         
         return jsonify({
             'success': True,
             'data': {
-                'total_telegram_clients': len(telegram_clients),
-                'telegram_bookings': len(telegram_bookings),
-                'active_subscribers': len(active_subscribers),
-                'bot_running': master_id in plugin.bot_manager.bots
+                **stats,
+                'bot_running': plugin.bot_manager.status(master_id)['running'],
+                'reminders': plugin.bot_manager.reminder_counters(master_id),
+                'outbox': dict(outbox.counters, queued=outbox.queued) if outbox else None
             }
         })
\ No newline at end of file
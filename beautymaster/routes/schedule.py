@@ -1,5 +1,12 @@
 from flask import jsonify, request, session
 from datetime import datetime, timedelta, date
+from ..availability import SLOT_STEP, day_availability, range_availability, service_duration
+from ..analytics import GRANULARITIES, MAX_ANALYTICS_DAYS, build_series
+from ..http_cache import cached_json
+from ..migrations import STATS_SCOPES
+
+# Максимальная длина диапазона для /availability/range, дней
+MAX_RANGE_DAYS = 62
 
 def register_schedule_routes(app, plugin):
     
@@ -14,8 +21,7 @@ def register_schedule_routes(app, plugin):
             return jsonify({'error': 'База данных не найдена'}), 400
         
         if request.method == 'GET':
-            schedule = db.get_schedule()
-            return jsonify({'success': True, 'data': schedule})
+            return cached_json(db, ('schedule',), lambda: {'success': True, 'data': db.get_schedule()})
         
         elif request.method == 'POST':
             data = request.json
@@ -44,45 +50,23 @@ def register_schedule_routes(app, plugin):
         except:
             return jsonify({'error': 'Неверный формат даты'}), 400
         
-        # Получаем расписание на этот день
-        schedule = db.get_schedule()
-        day_schedule = next((s for s in schedule if s['day_of_week'] == check_date.weekday()), None)
+        step = request.args.get('step', SLOT_STEP, type=int)
+        if step <= 0:
+            return jsonify({'error': 'Неверный шаг'}), 400
+        
+        # Слот свободен, только если вся услуга помещается до следующей записи
+        service_id = request.args.get('service_id', type=int)
+        duration = service_duration(db, service_id, default=step)
+        
+        day_schedule, bookings, available_slots = day_availability(db, check_date, duration, step)
         
-        if not day_schedule or not day_schedule.get('is_working'):
+        if not day_schedule:
             return jsonify({
                 'success': True,
                 'is_working': False,
                 'available_slots': []
             })
         
-        # Получаем бронирования на эту дату
-        bookings = db.get_bookings_for_date(date_str)
-        
-        # Генерируем доступные слоты
-        available_slots = []
-        current = datetime.combine(check_date, datetime.strptime(day_schedule['start_time'], '%H:%M').time())
-        end = datetime.combine(check_date, datetime.strptime(day_schedule['end_time'], '%H:%M').time())
-        
-        while current < end:
-            time_str = current.strftime('%H:%M')
-            is_available = True
-            
-            for b in bookings:
-                b_dt = datetime.combine(
-                    datetime.strptime(b['date'], '%Y-%m-%d').date(),
-                    datetime.strptime(b['time'], '%H:%M').time()
-                )
-                b_end = b_dt + timedelta(minutes=b['duration'])
-                
-                if b_dt <= current < b_end:
-                    is_available = False
-                    break
-            
-            if is_available:
-                available_slots.append(time_str)
-            
-            current += timedelta(minutes=30)
-        
         return jsonify({
             'success': True,
             'is_working': True,
@@ -91,6 +75,37 @@ def register_schedule_routes(app, plugin):
             'bookings': bookings
         })
     
+    @app.route('/api/plugins/beautymaster/availability/range', methods=['GET'])
+    def beautymaster_availability_range():
+        """Доступность на диапазон дат"""
+        if 'user_id' not in session:
+            return jsonify({'error': 'Не авторизован'}), 401
+        
+        db = plugin.get_current_master_db()
+        if not db:
+            return jsonify({'error': 'База данных не найдена'}), 400
+        
+        try:
+            date_from = datetime.strptime(request.args.get('from', ''), '%Y-%m-%d').date()
+            date_to = datetime.strptime(request.args.get('to', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'Неверный формат даты'}), 400
+        
+        if date_to < date_from:
+            return jsonify({'error': 'Дата окончания раньше даты начала'}), 400
+        if (date_to - date_from).days >= MAX_RANGE_DAYS:
+            return jsonify({'error': f'Диапазон не может превышать {MAX_RANGE_DAYS} дней'}), 400
+        
+        step = request.args.get('step', SLOT_STEP, type=int)
+        if step <= 0:
+            return jsonify({'error': 'Неверный шаг'}), 400
+        
+        service_id = request.args.get('service_id', type=int)
+        duration = service_duration(db, service_id, default=step)
+        
+        days = range_availability(db, date_from, date_to, duration, step)
+        return jsonify({'success': True, 'data': days})
+    
     @app.route('/api/plugins/beautymaster/stats', methods=['GET'])
     def beautymaster_stats():
         """Статистика"""
@@ -101,5 +116,48 @@ def register_schedule_routes(app, plugin):
         if not db:
             return jsonify({'error': 'База данных не найдена'}), 400
         
-        stats = db.get_stats()
-        return jsonify({'success': True, 'data': stats})
\ No newline at end of file
+        # Записи за месяц считаются от начала текущего месяца
+        return cached_json(
+            db,
+            STATS_SCOPES,
+            lambda: {'success': True, 'data': db.get_stats()},
+            extra=date.today().strftime('%Y-%m')
+        )
+    
+    @app.route('/api/plugins/beautymaster/analytics', methods=['GET'])
+    def beautymaster_analytics():
+        """Выручка, записи, отмены и занятость по дням, неделям или месяцам"""
+        if 'user_id' not in session:
+            return jsonify({'error': 'Не авторизован'}), 401
+        
+        db = plugin.get_current_master_db()
+        if not db:
+            return jsonify({'error': 'База данных не найдена'}), 400
+        
+        # По умолчанию — последние 30 дней
+        try:
+            date_to = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else date.today()
+            date_from = (datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from')
+                         else date_to - timedelta(days=29))
+        except ValueError:
+            return jsonify({'error': 'Неверный формат даты'}), 400
+        
+        if date_to < date_from:
+            return jsonify({'error': 'Дата окончания раньше даты начала'}), 400
+        if (date_to - date_from).days >= MAX_ANALYTICS_DAYS:
+            return jsonify({'error': f'Диапазон не может превышать {MAX_ANALYTICS_DAYS} дней'}), 400
+        
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            return jsonify({'error': f'Шаг должен быть одним из: {", ".join(GRANULARITIES)}'}), 400
+        
+        rows = db.get_daily_stats(date_from.isoformat(), date_to.isoformat())
+        series, totals = build_series(rows, db.get_schedule(), date_from, date_to, granularity)
+        return jsonify({
+            'success': True,
+            'data': {
+                'granularity': granularity,
+                'series': series,
+                'totals': totals
+            }
+        })
@@ -1,5 +1,7 @@
 from flask import jsonify, request, session
 
+from ..http_cache import cached_json
+
 def register_services_routes(app, plugin):
     
     @app.route('/api/plugins/beautymaster/services', methods=['GET', 'POST'])
@@ -14,13 +16,15 @@ def register_services_routes(app, plugin):
             return jsonify({'error': 'База данных не найдена'}), 400
         
         if request.method == 'GET' and service_id is None:
-            services = db.get_services()
-            categories = list(set(s['category'] for s in services if s['category']))
-            return jsonify({
-                'success': True, 
-                'data': services,
-                'categories': categories
-            })
+            def build():
+                services = db.get_services()
+                categories = list(set(s['category'] for s in services if s['category']))
+                return {
+                    'success': True, 
+                    'data': services,
+                    'categories': categories
+                }
+            return cached_json(db, ('services',), build)
         
         elif request.method == 'GET' and service_id:
             service = db.get_service(service_id)
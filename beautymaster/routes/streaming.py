@@ -0,0 +1,37 @@
+import json
+from flask import Response, stream_with_context
+
+
+def _dumps(row):
+    return json.dumps(row, ensure_ascii=False, default=str)
+
+
+def stream_rows(rows, fmt):
+    """Потоковый ответ со списком строк.
+
+    fmt='ndjson' — по одному JSON-объекту на строку;
+    иначе — тот же конверт {"success": true, "data": [...]}, что и у обычного
+    ответа, но отдаваемый по частям.
+    """
+    if fmt == 'ndjson':
+        def generate():
+            for row in rows:
+                yield _dumps(row) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    def generate():
+        yield '{"success": true, "data": ['
+        first = True
+        for row in rows:
+            yield (_dumps(row) if first else ',' + _dumps(row))
+            first = False
+        yield ']}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def wants_stream(request):
+    """Формат потоковой выдачи из параметра ?format= (или None)"""
+    fmt = request.args.get('format')
+    return fmt if fmt in ('ndjson', 'stream') else None
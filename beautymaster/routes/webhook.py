@@ -0,0 +1,26 @@
+import hmac
+from flask import jsonify, request
+from ..bot_manager import WEBHOOK_ROUTE
+
+def register_webhook_routes(app, plugin):
+    
+    @app.route(f'{WEBHOOK_ROUTE}/<path>', methods=['POST'])
+    def beautymaster_telegram_webhook(path):
+        """Прием обновлений Telegram для всех ботов мастеров (режим webhook)"""
+        bot = plugin.bot_manager.get_webhook_bot(path)
+        if not bot:
+            return jsonify({'error': 'Бот не найден'}), 404
+        
+        secret = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not hmac.compare_digest(secret, bot.webhook_secret):
+            return jsonify({'error': 'Доступ запрещен'}), 403
+        
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({'error': 'Пустое обновление'}), 400
+        
+        # Telegram повторит доставку, если бот еще не готов
+        if not bot.feed_update(data):
+            return jsonify({'error': 'Бот не запущен'}), 503
+        
+        return jsonify({'ok': True})